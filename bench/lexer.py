@@ -0,0 +1,34 @@
+# Mesure le temps de tokenization de longues chaînes de caractères.
+# À lancer depuis la racine du dépôt : "python3 bench/lexer.py".
+# Le temps par Mo doit rester à peu près constant : la tokenization
+# est linéaire en la taille des chaînes.
+
+import sys
+import time
+sys.path.insert(0, './src')
+
+from Tokenizer import Tokenizer
+
+def buildSource(size):
+    # Une chaîne de "size" caractères, avec quelques échappements.
+    line = "Lorem ipsum dolor sit amet, \\\"consectetur\\\" elit.\\n"
+    body = line * (size // len(line) + 1)
+    return "\"{}\"".format(body[:size])
+
+def measure(source, legacy):
+    start = time.perf_counter()
+    tokenizer = Tokenizer(source, legacy)
+
+    while not tokenizer.lookahead().isEOF():
+        tokenizer.nextToken()
+
+    return time.perf_counter() - start
+
+for legacy in [False, True]:
+    name = "legacy" if legacy else "table"
+
+    for size in [1 << 16, 1 << 18, 1 << 20]:
+        elapsed = measure(buildSource(size), legacy)
+        print("{:>6} {:>8} chars: {:.4f}s ({:.4f}s/MB)".format(
+            name, size, elapsed, elapsed / size * (1 << 20)
+        ))
@@ -0,0 +1,63 @@
+# Mesure le temps d'analyse syntaxique d'expressions chargées en
+# opérateurs. À lancer depuis la racine du dépôt : "python3 bench/parser.py".
+# Le temps par opérateur doit rester à peu près constant : l'analyse
+# d'une expression est linéaire en son nombre d'opérateurs.
+
+import sys
+import time
+sys.path.insert(0, './src')
+
+from Tokenizer import Tokenizer
+from parseFunction import parseFunction
+
+operators = ["+", "*", "-", "/", "&&", "||", "@"]
+
+def flatChain(count):
+    # "a + b + ... + a" : un seul "Arith" à "count + 1" opérandes.
+    return " + ".join("ab"[i % 2] for i in range(count + 1))
+
+def mixedChain(count):
+    # Toutes les précédences, dans un ordre qui monte et redescend.
+    terms = ["x"]
+
+    for i in range(count):
+        terms.append(operators[(i * 3) % len(operators)])
+        terms.append("!y" if i % 5 == 0 else "x")
+
+    return " ".join(terms)
+
+def comparisons(count):
+    # Des appels dont les arguments sont des comparaisons.
+    return " + ".join(["f(a * b < c, d - e >= g)"] * (count // 5))
+
+def nestedChain(count):
+    # "a + (a + (... + a))" : une imbrication de profondeur "count".
+    return "a + (" * count + "a" + ")" * count
+
+def buildSource(expression):
+    return "fn main: void -> void {{ let y = {}; }}".format(expression)
+
+def measure(source, repeat):
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parseFunction(Tokenizer(source))
+        elapsed = time.perf_counter() - start
+
+        if best == None or elapsed < best:
+            best = elapsed
+
+    return best
+
+for name, build in [
+    ("flat", flatChain),
+    ("mixed", mixedChain),
+    ("compare", comparisons),
+    ("nested", nestedChain)
+]:
+    for count in [1000, 10000, 100000]:
+        elapsed = measure(buildSource(build(count)), 3)
+        print("{:>8} {:>7} ops: {:.4f}s ({:.2f}us/op)".format(
+            name, count, elapsed, elapsed / count * 1e6
+        ))
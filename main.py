@@ -7,6 +7,7 @@ from AST import ASTError
 from Tokenizer import TokenizerError
 from flatIR import FlattenError
 import OklmRunner
+from ASTCache import ASTCache, CacheError
 
 printStackTrace = False
 try:
@@ -23,9 +24,44 @@ try:
     parser.add_argument(
         "--gen", action="store_true", help="Show generated code."
     )
+    parser.add_argument(
+        "--report", action="store_true",
+        help="Show what the optimizations removed from each function."
+    )
+    parser.add_argument(
+        "--inline", type=int, default=24, metavar="N",
+        help=(
+            "Replace the calls to non-recursive functions of at most " +
+            "N instructions by their body (default: 24, 0 disables it)."
+        )
+    )
     parser.add_argument(
         "--norun", action="store_true", help="Don't run the file."
     )
+    lexers = parser.add_mutually_exclusive_group()
+    lexers.add_argument(
+        "--legacy-lexer", action="store_true",
+        help="Use the former (slower) tokenizer."
+    )
+    lexers.add_argument(
+        "--stream", action="store_true",
+        help="Read the file by chunks instead of loading it at once."
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1, metavar="N",
+        help="Parse and compile the functions of the file in N processes."
+    )
+    parser.add_argument(
+        "--cache", nargs="?", const=".oklm_cache", metavar="DIR",
+        help=(
+            "Reuse the functions parsed and compiled by a previous run " +
+            "(stored in DIR, default: .oklm_cache)."
+        )
+    )
+    parser.add_argument(
+        "--cache-size", type=int, default=64, metavar="MB",
+        help="Maximum size of the cache (default: 64MB)."
+    )
     parser.add_argument(
         "--dev", action="store_true",
         help="Enable dev mode (prints error stack trace)."
@@ -34,15 +70,25 @@ try:
     args = parser.parse_args()
     printStackTrace = args.dev
 
-    with open(args.file) as file:
+    cache = None
+
+    if args.cache != None:
+        cache = ASTCache(args.cache, args.cache_size << 20)
+
+    with open(args.file, "rb" if args.stream else "r") as file:
         OklmRunner.run(
-            file.read(),
+            file if args.stream else file.read(),
             args.ast,
             args.ir,
             args.gen,
-            (not args.norun)
+            (not args.norun),
+            args.legacy_lexer,
+            args.jobs,
+            cache,
+            args.report,
+            args.inline
         )
-except (TokenizerError, ASTError, FlattenError) as err:
+except (TokenizerError, ASTError, FlattenError, CacheError) as err:
     print(err)
     if printStackTrace:
         print("\n\n")
@@ -22,215 +22,236 @@ class ASTError(BaseException):
 def tabs(n):
     return "    " * n
 
+def prettyItems(items, indent, n, separator=","):
+    # Morceaux (voir "prettyParts") d'une liste d'éléments affichés au
+    # niveau "n", un par ligne, après "indent" tabulations.
+    parts = []
+
+    for item in items:
+        parts += ["\n" + tabs(indent), (item, n), separator]
+
+    return parts
+
 class Block(CodeEntity):
+    __slots__ = ("commands",)
+
     def __init__(self, pos, commands):
         super().__init__(pos)
         self.commands = commands
 
-    def pretty(self, n):
-        commands = ""
-
-        for c in self.commands:
-            commands += "\n{}{},".format(tabs(n+1), c.pretty(n+1))
-
-        return "Block([{}\n{}])".format(
-            commands,
-            tabs(n)
+    def prettyParts(self, n):
+        return (
+            ["Block(["] +
+            prettyItems(self.commands, n+1, n+1) +
+            ["\n{}])".format(tabs(n))]
         )
 
 class Let(CodeEntity):
+    __slots__ = ("lvalue", "rvalue")
+
     def __init__(self, pos, lvalue, rvalue):
         super().__init__(pos)
         self.lvalue = lvalue
         self.rvalue = rvalue
 
-    def pretty(self, n):
-        return "Let(\n{}lvalue={},\n{}rvalue={}\n{})".format(
-            tabs(n+1),
-            self.lvalue.pretty(n+1),
-            tabs(n+1),
-            self.rvalue.pretty(n+1),
-            tabs(n)
-        )
+    def prettyParts(self, n):
+        return [
+            "Let(\n{}lvalue=".format(tabs(n+1)),
+            (self.lvalue, n+1),
+            ",\n{}rvalue=".format(tabs(n+1)),
+            (self.rvalue, n+1),
+            "\n{})".format(tabs(n))
+        ]
 
 class Set(CodeEntity):
+    __slots__ = ("lvalue", "rvalue")
+
     def __init__(self, pos, lvalue, rvalue):
         super().__init__(pos)
         self.lvalue = lvalue
         self.rvalue = rvalue
 
-    def pretty(self, n):
-        return "Set(\n{}lvalue={},\n{}rvalue={}\n{})".format(
-            tabs(n+1),
-            self.lvalue.pretty(n+1),
-            tabs(n+1),
-            self.rvalue.pretty(n+1),
-            tabs(n)
-        )
+    def prettyParts(self, n):
+        return [
+            "Set(\n{}lvalue=".format(tabs(n+1)),
+            (self.lvalue, n+1),
+            ",\n{}rvalue=".format(tabs(n+1)),
+            (self.rvalue, n+1),
+            "\n{})".format(tabs(n))
+        ]
 
 class Return(CodeEntity):
+    __slots__ = ("value",)
+
     def __init__(self, pos, value):
         super().__init__(pos)
         self.value = value
 
-    def pretty(self, n):
-        return "Return(\n{}value={}\n{})".format(
-            tabs(n+1),
-            self.value.pretty(n+1),
-            tabs(n)
-        )
+    def prettyParts(self, n):
+        return [
+            "Return(\n{}value=".format(tabs(n+1)),
+            (self.value, n+1),
+            "\n{})".format(tabs(n))
+        ]
 
 class BlockReturn(CodeEntity):
+    __slots__ = ("value",)
+
     def __init__(self, pos, value):
         super().__init__(pos)
         self.value = value
 
-    def pretty(self, n):
-        return "BlockReturn(\n{}value={}\n{})".format(
-            tabs(n+1),
-            self.value.pretty(n+1),
-            tabs(n)
-        )
+    def prettyParts(self, n):
+        return [
+            "BlockReturn(\n{}value=".format(tabs(n+1)),
+            (self.value, n+1),
+            "\n{})".format(tabs(n))
+        ]
 
 class Break(CodeEntity):
+    __slots__ = ("value",)
+
     def __init__(self, pos, value):
         super().__init__(pos)
         self.value = value
 
-    def pretty(self, n):
+    def prettyParts(self, n):
         value = "(none)"
 
         if self.value != None:
-            value = self.value.pretty(n+1)
+            value = (self.value, n+1)
 
-        return "Break(\n{}value={}\n{})".format(
-            tabs(n+1),
+        return [
+            "Break(\n{}value=".format(tabs(n+1)),
             value,
-            tabs(n)
-        )
+            "\n{})".format(tabs(n))
+        ]
 
 class Call(CodeEntity):
+    __slots__ = ("target", "args")
+
     def __init__(self, pos, target, args):
         super().__init__(pos)
         self.target = target
         self.args = args
 
-    def pretty(self, n):
-        args = ""
-
-        for a in self.args:
-            args += "\n{}{},".format(tabs(n+2), a.pretty(n+2))
-
-        return "Call(\n{}target={},\n{}args=[{}\n{}]\n{})".format(
-            tabs(n+1),
-            self.target.pretty(n+1),
-            tabs(n+1),
-            args,
-            tabs(n+1),
-            tabs(n)
+    def prettyParts(self, n):
+        return (
+            [
+                "Call(\n{}target=".format(tabs(n+1)),
+                (self.target, n+1),
+                ",\n{}args=[".format(tabs(n+1))
+            ] +
+            prettyItems(self.args, n+2, n+2) +
+            ["\n{}]\n{})".format(tabs(n+1), tabs(n))]
         )
 
 class Var(CodeEntity):
+    __slots__ = ("name",)
+
     def __init__(self, pos, name):
         super().__init__(pos)
         self.name = name
 
-    def pretty(self, n):
-        return "Var(name=\"{}\")".format(self.name)
+    def prettyParts(self, n):
+        return ["Var(name=\"{}\")".format(self.name)]
 
 class Arith(CodeEntity):
+    __slots__ = ("op", "operands")
+
     def __init__(self, pos, op, operands):
         super().__init__(pos)
         self.op = op
         self.operands = operands
 
-    def pretty(self, n):
-        operands = ""
-
-        for o in self.operands:
-            operands += "\n{}{},".format(tabs(n+2), o.pretty(n+2))
-
-        return "Arith(\n{}op={},\n{}operands=[{}\n{}]\n{})".format(
-            tabs(n+1),
-            self.op.pretty(n+1),
-            tabs(n+1),
-            operands,
-            tabs(n+1),
-            tabs(n)
+    def prettyParts(self, n):
+        return (
+            [
+                "Arith(\n{}op={},\n{}operands=[".format(
+                    tabs(n+1),
+                    self.op.pretty(n+1),
+                    tabs(n+1)
+                )
+            ] +
+            prettyItems(self.operands, n+2, n+2) +
+            ["\n{}]\n{})".format(tabs(n+1), tabs(n))]
         )
 
 class Cmp(CodeEntity):
+    __slots__ = ("cmps",)
+
     def __init__(self, pos, cmps):
         super().__init__(pos)
         self.cmps = cmps
 
-    def pretty(self, n):
-        cmps = ""
-
-        def formatOperand(oplist):
-            l = ""
-
-            for o in oplist:
-                l += '\n{}{}'.format(tabs(n+2), o.pretty(n+2))
-
-            return "[{}\n{}]".format(l, tabs(n+1))
+    def prettyParts(self, n):
+        parts = ["Cmp("]
 
         for op, r in self.cmps:
-            content = None
+            parts.append("\n{}".format(tabs(n+1)))
 
             if op == Comparison.OPERAND:
-                content = formatOperand(r)
+                parts.append("[")
+                parts += prettyItems(r, n+2, n+2, "")
+                parts.append("\n{}]".format(tabs(n+1)))
             else:
-                content = op.pretty(n+1)
-
-            cmps += "\n{}{}".format(tabs(n+1), content)
+                parts.append(op.pretty(n+1))
 
-        return "Cmp({}\n{})".format(cmps, tabs(n))
+        parts.append("\n{})".format(tabs(n)))
+        return parts
 
 class Unary(CodeEntity):
+    __slots__ = ("op", "target")
+
     def __init__(self, pos, op, target):
         super().__init__(pos)
         self.op = op
         self.target = target
 
-    def pretty(self, n):
-        return "Unary(\n{}op={},\n{}target={}\n{})".format(
-            tabs(n+1),
-            self.op.pretty(n+1),
-            tabs(n+1),
-            self.target.pretty(n+1),
-            tabs(n)
-        )
+    def prettyParts(self, n):
+        return [
+            "Unary(\n{}op={},\n{}target=".format(
+                tabs(n+1),
+                self.op.pretty(n+1),
+                tabs(n+1)
+            ),
+            (self.target, n+1),
+            "\n{})".format(tabs(n))
+        ]
 
 class Constant(CodeEntity):
+    __slots__ = ("type", "val")
+
     def __init__(self, pos, type, val):
         super().__init__(pos)
         self.type = type
         self.val = val
 
-    def pretty(self, n):
-        return "Constant(type={}, val={})".format(
-            self.type.pretty(n+1),
-            self.val.__repr__()
-        )
+    def prettyParts(self, n):
+        return [
+            "Constant(type={}, val={})".format(
+                self.type.pretty(n+1),
+                self.val.__repr__()
+            )
+        ]
 
 class Tuple(CodeEntity):
+    __slots__ = ("contents",)
+
     def __init__(self, pos, contents):
         super().__init__(pos)
         self.contents = contents
 
-    def pretty(self, n):
-        contents = ""
-
-        for c in self.contents:
-            contents += "\n{}{},".format(tabs(n+1), c.pretty(n+1))
-
-        return "Tuple({}\n{})".format(
-            contents,
-            tabs(n),
+    def prettyParts(self, n):
+        return (
+            ["Tuple("] +
+            prettyItems(self.contents, n+1, n+1) +
+            ["\n{})".format(tabs(n))]
         )
 
 class IfBlock(CodeEntity):
+    __slots__ = ("cond", "valIfTrue", "valElse")
+
     def __init__(self, pos, cond, valIfTrue, valElse):
         # "valElse" vaut éventuellemnt "None"
         super().__init__(pos)
@@ -238,26 +259,25 @@ class IfBlock(CodeEntity):
         self.valIfTrue = valIfTrue
         self.valElse = valElse
 
-    def pretty(self, n):
+    def prettyParts(self, n):
         valElse = "(void)"
 
         if self.valElse != None:
-            valElse = self.valElse.pretty(n+1)
-
-        return (
-            "IfBlock(\n{}cond={},\n{}valIfTrue={}," +
-             "\n{}valElse={}\n{})"
-        ).format(
-            tabs(n+1),
-            self.cond.pretty(n+1),
-            tabs(n+1),
-            self.valIfTrue.pretty(n+1),
-            tabs(n+1),
+            valElse = (self.valElse, n+1)
+
+        return [
+            "IfBlock(\n{}cond=".format(tabs(n+1)),
+            (self.cond, n+1),
+            ",\n{}valIfTrue=".format(tabs(n+1)),
+            (self.valIfTrue, n+1),
+            ",\n{}valElse=".format(tabs(n+1)),
             valElse,
-            tabs(n)
-        )
+            "\n{})".format(tabs(n))
+        ]
 
 class IfUnwrapBlock(CodeEntity):
+    __slots__ = ("box", "target", "valIfTrue", "valElse")
+
     def __init__(self, pos, box, target, valIfTrue, valElse):
         # "valElse" vaut éventuellemnt "None"
         super().__init__(pos)
@@ -266,87 +286,98 @@ class IfUnwrapBlock(CodeEntity):
         self.valIfTrue = valIfTrue
         self.valElse = valElse
 
-    def pretty(self, n):
+    def prettyParts(self, n):
         valElse = "(void)"
 
         if self.valElse != None:
-            valElse = self.valElse.pretty(n+1)
-
-        return (
-            "IfUnwrapBlock(\n{}box={},\n{}target={},\n{}valIfTrue={}," +
-             "\n{}valElse={}\n{})"
-        ).format(
-            tabs(n+1),
-            self.box.pretty(n+1),
-            tabs(n+1),
-            self.target.pretty(n+1),
-            tabs(n+1),
-            self.valIfTrue.pretty(n+1),
-            tabs(n+1),
+            valElse = (self.valElse, n+1)
+
+        return [
+            "IfUnwrapBlock(\n{}box=".format(tabs(n+1)),
+            (self.box, n+1),
+            ",\n{}target=".format(tabs(n+1)),
+            (self.target, n+1),
+            ",\n{}valIfTrue=".format(tabs(n+1)),
+            (self.valIfTrue, n+1),
+            ",\n{}valElse=".format(tabs(n+1)),
             valElse,
-            tabs(n)
-        )
+            "\n{})".format(tabs(n))
+        ]
 
 class LoopBlock(CodeEntity):
+    __slots__ = ("block",)
+
     def __init__(self, pos, block):
         super().__init__(pos)
         self.block = block
 
-    def pretty(self, n):
-        return "LoopBlock({})".format(self.block.pretty(n))
+    def prettyParts(self, n):
+        return ["LoopBlock(", (self.block, n), ")"]
 
 class Wrap(CodeEntity):
+    __slots__ = ("target",)
+
     def __init__(self, pos, target):
         super().__init__(pos)
         self.target = target
 
-    def pretty(self, n):
-        return "Wrap(\n{}target={}\n{})".format(
-            tabs(n+1),
-            self.target.pretty(n+1),
-            tabs(n)
-        )
+    def prettyParts(self, n):
+        return [
+            "Wrap(\n{}target=".format(tabs(n+1)),
+            (self.target, n+1),
+            "\n{})".format(tabs(n))
+        ]
 
 class WrapEmpty(CodeEntity):
+    __slots__ = ("type",)
+
     def __init__(self, pos, type):
         super().__init__(pos)
         self.type = type
 
-    def pretty(self, n):
-        return "WrapEmpty(\n{}type={}\n{})".format(
-            tabs(n+1),
-            self.type.pretty(n+1),
-            tabs(n)
-        )
+    def prettyParts(self, n):
+        return [
+            "WrapEmpty(\n{}type={}\n{})".format(
+                tabs(n+1),
+                self.type.pretty(n+1),
+                tabs(n)
+            )
+        ]
 
 class Cons(CodeEntity):
+    __slots__ = ("element", "list")
+
     def __init__(self, pos, element, list):
         super().__init__(pos)
         self.element = element
         self.list = list
 
-    def pretty(self, n):
-        return "Cons(\n{}element={},\n{}list={}\n{})".format(
-            tabs(n+1),
-            self.element.pretty(n+1),
-            tabs(n+1),
-            list,
-            tabs(n)
-        )
+    def prettyParts(self, n):
+        return [
+            "Cons(\n{}element=".format(tabs(n+1)),
+            (self.element, n+1),
+            ",\n{}list={}\n{})".format(tabs(n+1), list, tabs(n))
+        ]
 
 class ConsEmpty(CodeEntity):
+    __slots__ = ("type",)
+
     def __init__(self, pos, type):
         super().__init__(pos)
         self.type = type
 
-    def pretty(self, n):
-        return "ConsEmpty(\n{}type={}\n{})".format(
-            tabs(n+1),
-            self.type.pretty(n+1),
-            tabs(n)
-        )
+    def prettyParts(self, n):
+        return [
+            "ConsEmpty(\n{}type={}\n{})".format(
+                tabs(n+1),
+                self.type.pretty(n+1),
+                tabs(n)
+            )
+        ]
 
 class Function(CodeEntity):
+    __slots__ = ("name", "args", "type", "body")
+
     def __init__(self, pos, name, type, args, body):
         super().__init__(pos)
         self.name = name
@@ -354,24 +385,22 @@ class Function(CodeEntity):
         self.type = type
         self.body = body
 
-    def pretty(self, n):
-        args = ""
-        retType = "None"
-
-        for a in self.args:
-            args += "\n{}{},".format(tabs(n+2), a.pretty(n+2))
-
-        return ("Function(\n{}name=\"{}\"\n{}type=\"{}\"," +
-            "\n{}args=[{}\n{}],\n{}body={}\n{})"
-        ).format(
-            tabs(n+1),
-            self.name,
-            tabs(n+1),
-            self.type.type_repr(),
-            tabs(n+1),
-            args,
-            tabs(n+1),
-            tabs(n+1),
-            self.body.pretty(n+1),
-            tabs(n)
+    def prettyParts(self, n):
+        return (
+            [
+                "Function(\n{}name=\"{}\"\n{}type=\"{}\",\n{}args=[".format(
+                    tabs(n+1),
+                    self.name,
+                    tabs(n+1),
+                    self.type.type_repr(),
+                    tabs(n+1)
+                )
+            ] +
+            prettyItems(self.args, n+2, n+2) +
+            [
+                "\n{}],\n{}body=".format(tabs(n+1), tabs(n+1)),
+                (self.body, n+1),
+                "\n{})".format(tabs(n))
+            ]
         )
+
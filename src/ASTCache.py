@@ -0,0 +1,173 @@
+import gc
+import hashlib
+import os
+import pickle
+import stat
+
+class CacheError(BaseException):
+    def __init__(self, directory, reason):
+        self.args = [
+            "Can't use the cache in {} :\n{}".format(directory, reason)
+        ]
+
+def checkDirectory(directory):
+    # Crée "directory" s'il n'existe pas. Les entrées du cache sont
+    # relues avec "pickle", qui peut exécuter n'importe quel code : on
+    # ne relit qu'un répertoire à nous, où les autres utilisateurs ne
+    # peuvent pas écrire.
+    try:
+        os.makedirs(directory, 0o700, exist_ok=True)
+        info = os.stat(directory)
+    except OSError as err:
+        raise CacheError(directory, "{}.".format(err.strerror))
+
+    if hasattr(os, "getuid") and info.st_uid != os.getuid():
+        raise CacheError(directory, "It belongs to another user.")
+
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise CacheError(directory, "Other users can write to it.")
+
+def frontEndVersion():
+    # Empreinte des sources du compilateur : une entrée écrite par une
+    # autre version (où les classes de l'AST ont pu changer) ne doit
+    # jamais être relue.
+    directory = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".py"):
+            with open(os.path.join(directory, name), "rb") as file:
+                digest.update(name.encode())
+                digest.update(file.read())
+
+    return digest.hexdigest()
+
+def withoutCollector(action):
+    # Les AST lus ou écrits sont faits de milliers de petits objets :
+    # les passes du ramasse-miettes qu'ils déclenchent coûtent plus cher
+    # que leur lecture ou leur écriture, et n'ont rien à libérer.
+    collecting = gc.isenabled()
+    gc.disable()
+
+    try:
+        return action()
+    finally:
+        if collecting:
+            gc.enable()
+
+class ASTCache:
+    # Cache sur disque des fonctions déjà analysées. Une entrée contient
+    # les fonctions (avec leurs types) d'un fragment produit par
+    # "splitFunctions" ; sa clé est une empreinte du texte du fragment
+    # et de sa position (ligne, colonne) dans le fichier, puisque
+    # l'AST garde les positions.
+    # Le cache garde aussi le code généré pour chaque fonction (voir
+    # "compileProgram"), dans des entrées ".code" dont la clé ne dépend
+    # que du texte : l'IR et le code généré ne contiennent pas de
+    # positions.
+    # Quand le cache dépasse "maxSize" octets, on supprime les entrées
+    # utilisées le moins récemment.
+
+    def __init__(self, directory, maxSize):
+        self.directory = directory
+        self.maxSize = maxSize
+        self.version = frontEndVersion().encode()
+        checkDirectory(directory)
+
+    def key(self, chunk):
+        (code, (offset, line, lineOffset)) = chunk
+        digest = hashlib.sha256(self.version)
+        digest.update("{}:{}:".format(line, offset - lineOffset).encode())
+        digest.update(code.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def sourceKey(self, chunk, index):
+        # Clé du code généré pour la "index"-ième fonction du fragment.
+        (code, _) = chunk
+        digest = hashlib.sha256(self.version)
+        digest.update("code:{}:".format(index).encode())
+        digest.update(code.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def load(self, key, suffix=".ast"):
+        # Renvoie le contenu de l'entrée, ou None si elle n'existe
+        # pas ou n'est pas lisible (par exemple tronquée).
+        path = self.path(key, suffix)
+
+        try:
+            with open(path, "rb") as file:
+                functions = pickle.loads(file.read())
+
+            # La date de modification sert à l'éviction.
+            os.utime(path)
+            return functions
+        except (
+            OSError, pickle.UnpicklingError, EOFError, AttributeError
+        ):
+            return None
+
+    def loadAll(self, keys, suffix=".ast"):
+        return withoutCollector(
+            lambda: [self.load(key, suffix) for key in keys]
+        )
+
+    def store(self, key, value, suffix=".ast"):
+        path = self.path(key, suffix)
+        temporary = "{}.{}.tmp".format(path, os.getpid())
+
+        try:
+            with open(temporary, "wb") as file:
+                pickle.dump(value, file, pickle.HIGHEST_PROTOCOL)
+
+            # Un autre processus ne lit jamais d'entrée incomplète.
+            os.replace(temporary, path)
+        except Exception:
+            # Par exemple un AST trop profond pour "pickle" : on ne
+            # le met simplement pas en cache.
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+
+    def storeAll(self, entries, suffix=".ast"):
+        # "entries" est une liste de couples (key, value).
+        def storeEntries():
+            for key, value in entries:
+                self.store(key, value, suffix)
+
+        withoutCollector(storeEntries)
+
+    def evict(self):
+        entries = []
+        size = 0
+
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith((".ast", ".code")):
+                continue
+
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            size += stat.st_size
+
+        if size <= self.maxSize:
+            return
+
+        entries.sort()
+
+        for _, entrySize, path in entries:
+            if size <= self.maxSize:
+                break
+
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+
+            size -= entrySize
@@ -7,13 +7,18 @@ from parse_util import *
 from parseLRValue import parseLRValue
 from parseBlock import parseBlock
 from parseFunction import parseFunction
+from parseProgram import parseProgram
 
-from Varstack import Varstack
 from flatIR import *
 from flatten import *
 from transpile import *
+from compileProgram import compileProgram
 
-def run(code, printAST, printIR, printGenerated, shouldExecute):
+def run(
+    code, printAST, printIR, printGenerated, shouldExecute,
+    legacyLexer=False, jobs=1, cache=None, printReport=False,
+    inlineThreshold=0
+):
     nullPos = ((0, 0), (0, 0))
     natives = [
         (
@@ -22,12 +27,12 @@ def run(code, printAST, printIR, printGenerated, shouldExecute):
         )
     ]
 
-    tokenizer = Tokenizer(code)
-    # On réserve déjà les noms des fonction natives.
-    fnames = [name for name, _ in natives]
+    # Table des fonctions (nom -> type), partagée avec "Varstack".
+    # On y réserve déjà les noms des fonction natives.
+    functionTypes = dict(natives)
     astFunctions = []
-    functionTypes = [pair for pair in natives]
-    irFunctions = []
+    # Pour chaque fonction, la clé de son code généré dans "cache".
+    sources = []
     generated = (
         "\n" +
         "def wrapper():\n" +
@@ -40,70 +45,91 @@ def run(code, printAST, printIR, printGenerated, shouldExecute):
             "\n"
     )
 
-    while True:
-        if tokenizer.lookahead().isEOF():
-            break
-
-        ast = parseFunction(tokenizer)
-
-        if ast.name in fnames:
+    def declare(ast, source=None):
+        if ast.name in functionTypes:
             raise ASTError(
                 ast.pos(),
                 "Function '{}' already declared.".format(ast.name)
             )
 
-        fnames.append(ast.name)
         astFunctions.append(ast)
-        functionTypes.append((ast.name, ast.type))
+        sources.append(source)
+        functionTypes[ast.name] = ast.type
+
+    parsed = None
+
+    if (
+        (jobs > 1 or cache != None) and
+        not legacyLexer and isinstance(code, str)
+    ):
+        parsed = parseProgram(code, jobs, cache)
+
+    if parsed != None:
+        for ast, source in parsed:
+            declare(ast, source)
+    else:
+        # "code" peut aussi être un fichier ouvert, lu alors par morceaux.
+        tokenizer = Tokenizer(code, legacyLexer)
+
+        while True:
+            if tokenizer.lookahead().isEOF():
+                break
+
+            ast = parseFunction(tokenizer)
+            # L'AST ne garde que des positions déjà calculées.
+            tokenizer.forgetParsed()
+            declare(ast)
 
     if printAST:
         for ast in astFunctions:
                 print(ast.pretty(0))
 
-    foundMain = False
-
-    for name, type in functionTypes:
-        if name == "main":
-            foundMain = True
-            typematch = True
-
-            if not len(type.args) == 1:
-                typematch = False
-            elif not type.args[0] == Void:
-                typematch = False
-            elif not type.ret == Void:
-                typematch = False
-
-            if not typematch:
-                raise ASTError(
-                    type.pos(),
-                    (
-                        "Expected function 'main' to be typed " +
-                        "'void -> void'"
-                    )
-                )
-
-    if not foundMain:
+    type = functionTypes.get("main")
+
+    if type == None:
         raise ASTError(
             nullPos,
             "Can't find function 'main'."
         )
 
-    varstack = Varstack(functionTypes)
-    for name, type in functionTypes:
+    typematch = True
+
+    if not len(type.args) == 1:
+        typematch = False
+    elif not type.args[0] == Void:
+        typematch = False
+    elif not type.ret == Void:
+        typematch = False
+
+    if not typematch:
+        raise ASTError(
+            type.pos(),
+            (
+                "Expected function 'main' to be typed " +
+                "'void -> void'"
+            )
+        )
+
+    for name, type in functionTypes.items():
         #print("{}: {}".format(name, type.type_repr()))
         pass
 
-    for ast in astFunctions:
-        flat = flattenFunction(varstack, ast.type, ast)
-        irFunctions.append(flat)
+    # Les fonctions sont compilées indépendamment les unes des autres.
+    compiled = compileProgram(
+        functionTypes, astFunctions, printIR, jobs, cache, sources,
+        inlineThreshold
+    )
 
     if printIR:
-        for ir in irFunctions:
-            print(ir.pretty(0))
+        for ir, _, _ in compiled:
+            print(ir)
+
+    if printReport:
+        for _, _, report in compiled:
+            print(report)
 
-    for flat in irFunctions:
-        generated += transpileFunction(flat)
+    for _, code, _ in compiled:
+        generated += code
 
     generated += "\n\tf_main()\nwrapper()\n"
 
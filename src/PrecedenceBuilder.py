@@ -1,146 +1,81 @@
-
-from enum import Enum, auto
 from AST import *
 from Tokens import *
 
+# Opérateurs binaires : opération associée et précédence (plus elle est
+# grande, plus l'opérateur lie fort). Deux opérateurs n'ont jamais la
+# même précédence, donc une suite d'opérateurs de même précédence est une
+# suite du même opérateur, et donne un seul "Arith" à plusieurs opérandes.
+operators = {
+    Symbol.CONCAT: (0, Operation.CONCAT),
+    Symbol.OR: (1, Operation.OR),
+    Symbol.AND: (2, Operation.AND),
+    Symbol.ADD: (3, Operation.ADD),
+    Symbol.SUB: (4, Operation.SUB),
+    Symbol.MUL: (5, Operation.MUL),
+    Symbol.DIV: (6, Operation.DIV)
+}
+
 class PrecedenceBuilder:
-    class Flags(Enum):
-        OPERAND = auto()
-        CONCAT = auto()
-        OR = auto()
-        AND = auto()
-        ADD = auto()
-        SUB = auto()
-        MUL = auto()
-        DIV = auto()
+    # Les nœuds encore ouverts sont dans "stack", de la racine au nœud
+    # courant, par précédences strictement croissantes. Un nœud est une
+    # liste [précédence, opération, opérandes] : les "Arith" ne sont
+    # construits qu'une fois l'expression terminée, quand on connaît
+    # sa position.
 
     def __init__(self):
-        self.top = (None, [])
-        self.root = self.top
-        self.prec_stack = [(-1, self.root)]
-        self.topPrec = -1
+        self.stack = []
         self.lastOperand = None
 
-    def precedence(self, op):
-        if op == Operation.CONCAT:
-            return 0
-        elif op == Operation.OR:
-            return 1
-        elif op == Operation.AND:
-            return 2
-        elif op == Operation.ADD:
-            return 3
-        elif op == Operation.SUB:
-            return 4
-        elif op == Operation.MUL:
-            return 5
-        elif op == Operation.DIV:
-            return 6
-        else:
-            raise ASTError(None, "Unknown operation.")
-
-    def matchingFlag(self, op):
-        if op == Operation.CONCAT:
-            return PrecedenceBuilder.Flags.CONCAT
-        elif op == Operation.OR:
-            return PrecedenceBuilder.Flags.OR
-        elif op == Operation.AND:
-            return PrecedenceBuilder.Flags.AND
-        elif op == Operation.ADD:
-            return PrecedenceBuilder.Flags.ADD
-        elif op == Operation.SUB:
-            return PrecedenceBuilder.Flags.SUB
-        elif op == Operation.MUL:
-            return PrecedenceBuilder.Flags.MUL
-        elif op == Operation.DIV:
-            return PrecedenceBuilder.Flags.DIV
-        else:
-            raise ASTError(None, "Unknown operation.")
-
-    def matchingOperation(self, op):
-        if op == PrecedenceBuilder.Flags.CONCAT:
-            return Operation.CONCAT
-        elif op == PrecedenceBuilder.Flags.OR:
-            return Operation.OR
-        elif op == PrecedenceBuilder.Flags.AND:
-            return Operation.AND
-        elif op == PrecedenceBuilder.Flags.ADD:
-            return Operation.ADD
-        elif op == PrecedenceBuilder.Flags.SUB:
-            return Operation.SUB
-        elif op == PrecedenceBuilder.Flags.MUL:
-            return Operation.MUL
-        elif op == PrecedenceBuilder.Flags.DIV:
-            return Operation.DIV
-
-    def descendPrec(self, prec):
-        formerTop = self.top
-
-        while True:
-            if len(self.prec_stack) == 0:
-                self.top = (None, [self.root])
-                self.topPrec = -1
-                self.root = self.top
-                self.prec_stack = [(-1, self.root)]
-                break
-
-            (stack_max, node) = self.prec_stack[-1]
-            if stack_max <= prec:
-                self.top = node
-                self.topPrec = stack_max
-                break
+    def receiveOperator(self, operator):
+        (prec, operation) = operator
+        stack = self.stack
+        closed = None
 
-            self.prec_stack.pop()
+        # On ferme les nœuds qui lient plus fort que l'opérateur reçu.
+        while len(stack) != 0 and stack[-1][0] > prec:
+            closed = stack.pop()
 
             if self.lastOperand != None:
-                self.top[1].append(self.lastOperand)
+                closed[2].append(self.lastOperand)
                 self.lastOperand = None
 
-    def receiveOperator(self, operator):
-        prec = self.precedence(operator)
-        self.descendPrec(prec)
-
-        if self.top[0] == None:
-            top = (self.matchingFlag(operator), self.top[1])
-            self.root = top
-            self.top = top
-            self.prec_stack = [(prec, top)]
-            self.topPrec = prec
-        elif prec > self.topPrec:
-            self.topPrec = prec
-            top = (self.matchingFlag(operator), [])
-            self.top[1].append(top)
-            self.top = top
-            self.prec_stack.append((prec, top))
+        if len(stack) == 0:
+            # L'opérateur devient la racine, et l'ancienne racine
+            # (s'il y en a une) son premier opérande.
+            stack.append(
+                [prec, operation, [] if closed == None else [closed]]
+            )
+        elif stack[-1][0] < prec:
+            node = [prec, operation, []]
+            stack[-1][2].append(node)
+            stack.append(node)
 
         if self.lastOperand != None:
-            self.top[1].append(self.lastOperand)
+            stack[-1][2].append(self.lastOperand)
             self.lastOperand = None
 
     def receiveOperand(self, operand):
         if self.lastOperand != None:
-            self.top[1].append(self.lastOperand)
-            self.lastOperand = None
+            raise ASTError(None, "Missing an operator.")
 
-        self.lastOperand = (PrecedenceBuilder.Flags.OPERAND, operand)
+        self.lastOperand = operand
 
     def finalize(self, start, end):
+        if len(self.stack) == 0:
+            return self.lastOperand
+
         if self.lastOperand != None:
-            self.top[1].append(self.lastOperand)
+            self.stack[-1][2].append(self.lastOperand)
             self.lastOperand = None
 
-        def buildArith(pair):
-            if pair[0] == PrecedenceBuilder.Flags.OPERAND:
-                return pair[1]
-            op = self.matchingOperation(pair[0])
-            operands = [buildArith(el) for el in pair[1]]
-            return Arith((start, end), op, operands)
+        pos = (start, end)
 
-        if self.root[0] == None:
-            if len(self.root[1]) > 1:
-                raise ASTError(None, "Missing an operator.")
-            if len(self.root[1]) == 0:
-                return None
-            return buildArith(self.root[1][0])
+        # La profondeur est bornée par le nombre de précédences.
+        def buildArith(node):
+            operands = [
+                buildArith(el) if isinstance(el, list) else el
+                for el in node[2]
+            ]
+            return Arith(pos, node[1], operands)
 
-        return buildArith(self.root)
+        return buildArith(self.stack[0])
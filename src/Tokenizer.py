@@ -1,3 +1,6 @@
+import codecs
+import re
+
 from Tokens import *
 
 class RecognizerFlag(Enum):
@@ -104,21 +107,25 @@ def parseNum(word):
 
 class IdentifierRecognizer:
     def __init__(self):
-        self.word = ""
+        # Les caractères du mot sont accumulés dans une liste,
+        # et assemblés une seule fois dans "reject".
+        self.chars = []
 
     def reset(self):
-        self.word = ""
+        self.chars = []
 
     def reject(self):
-        if self.word != "":
+        if len(self.chars) != 0:
+            word = "".join(self.chars)
+
             for kw, seq in keywords:
-                if self.word == seq: return (
+                if word == seq: return (
                     RecognizerFlag.REJECTED,
                     (TokenType.KEYWORD, kw)
                 )
 
-            if str.isnumeric(self.word[0]):
-                num = parseNum(self.word)
+            if str.isnumeric(word[0]):
+                num = parseNum(word)
                 if num == None:
                     return (RecognizerFlag.REJECTED, None)
                 else: return (
@@ -127,7 +134,7 @@ class IdentifierRecognizer:
 
             return (
                 RecognizerFlag.REJECTED,
-                (TokenType.IDENTIFIER, self.word)
+                (TokenType.IDENTIFIER, word)
             )
         else:
             return (RecognizerFlag.REJECTED, None)
@@ -136,7 +143,7 @@ class IdentifierRecognizer:
         if not str.isalnum(char) and not char == '_':
             return self.reject()
 
-        self.word += char
+        self.chars.append(char)
         return (RecognizerFlag.WAITING, None)
 
     def finish(self):
@@ -171,7 +178,7 @@ class ConsumersWrapper:
         startpos = None
         reachLineEnd = False
         tokenizeString = False
-        builtString = ""
+        builtString = []
 
         self.resetBeforeToken()
 
@@ -182,7 +189,8 @@ class ConsumersWrapper:
             if self.i == len(self.str):
                 if tokenizeString:
                     return (
-                        (TokenType.STRING, builtString), startpos, pos
+                        (TokenType.STRING, "".join(builtString)),
+                        startpos, pos
                     )
                 elif whitespace: return ((TokenType.EOF, None), pos, pos)
                 else: return self.finishTokenizers(startpos, pos)
@@ -233,13 +241,14 @@ class ConsumersWrapper:
                             "Unknown escape sequence."
                         )
 
-                    builtString += escape_dict[escape]
+                    builtString.append(escape_dict[escape])
                 elif char == '"':
                     return (
-                        (TokenType.STRING, builtString), startpos, pos
+                        (TokenType.STRING, "".join(builtString)),
+                        startpos, pos
                     )
                 else:
-                    builtString += char
+                    builtString.append(char)
                 continue
             else:
                 if char == '"':
@@ -280,19 +289,415 @@ class ConsumersWrapper:
 
             whitespace = False
 
+class CharClass(Enum):
+    WORD = 0
+    SYMBOL = 1
+    QUOTE = 2
+    OTHER = 3
+
+# Arbre des symboles : chaque noeud est un couple (symbol, children),
+# où "symbol" est le symbole reconnu en s'arrêtant sur ce noeud (ou None).
+def _buildSymbolTrie():
+    root = (None, {})
+
+    for symbol, seq in symbols:
+        node = root
+
+        for k, char in enumerate(seq):
+            children = node[1]
+
+            if not char in children:
+                children[char] = (None, {})
+            if k + 1 == len(seq):
+                children[char] = (symbol, children[char][1])
+
+            node = children[char]
+
+    return root[1]
+
+symbolTrie = _buildSymbolTrie()
+keywordTable = {seq: kw for kw, seq in keywords}
+
+# Les caractères de "\w" sont exactement ceux que "IdentifierRecognizer"
+# accepte : "str.isalnum" et '_'.
+wordRun = re.compile(r'\w*')
+stringRun = re.compile(r'[^"\\#]*')
+blankRun = re.compile(r'[ \t]*')
+
+def _buildCharClasses():
+    classes = {}
+
+    for code in range(128):
+        char = chr(code)
+
+        if char in symbolTrie:
+            classes[char] = CharClass.SYMBOL
+        elif char == '"':
+            classes[char] = CharClass.QUOTE
+        elif str.isalnum(char) or char == '_':
+            classes[char] = CharClass.WORD
+        else:
+            classes[char] = CharClass.OTHER
+
+    return classes
+
+charClasses = _buildCharClasses()
+
+def charClass(char):
+    cls = charClasses.get(char)
+
+    if cls == None:
+        if str.isalnum(char):
+            return CharClass.WORD
+        return CharClass.OTHER
+
+    return cls
+
+escapeTable = {
+    '\\': '\\',
+    '"': '"',
+    '\'': '\'',
+    'n': '\n',
+    't': '\t'
+}
+
+class TableLexer:
+    # Lexer à table de transitions, en une seule passe.
+    # Produit exactement les mêmes tokens (et les mêmes positions)
+    # que "ConsumersWrapper", y compris ses particularités :
+    #  - un '#' ouvre un commentaire n'importe où, même au milieu
+    #    d'un mot, d'un symbole ou d'une chaîne de caractères ;
+    #  - un retour à la ligne dans une chaîne n'incrémente pas
+    #    le numéro de ligne ;
+    #  - la fin d'un symbole de deux caractères reconnu directement
+    #    est la position de son dernier caractère.
+    # Les positions sont des indices dans la source : les couples
+    # (ligne, colonne) se retrouvent grâce à "self.lines".
+
+    def __init__(self, str, start=None):
+        # "start" vaut éventuellement un triplet (offset, line,
+        # lineOffset) lorsque "str" n'est qu'un fragment de la source :
+        # "offset" est l'indice du fragment dans la source, "line" le
+        # numéro de sa première ligne et "lineOffset" l'indice du début
+        # de cette ligne.
+        self.str = str
+        self.length = len(str)
+        self.i = 0
+        # Indice, dans toute la source, du début de "self.str".
+        self.base = 0
+        self.lines = LineIndex()
+
+        if start != None:
+            (self.base, line, lineOffset) = start
+            self.lines = LineIndex(lineOffset, line)
+
+    def skipComment(self, i):
+        # Renvoie l'indice qui suit le commentaire commençant en "i".
+        end = self.str.find('\n', i)
+
+        if end == -1:
+            return self.length
+
+        self.lines.newLine(self.base + end + 1)
+        return end + 1
+
+    def fail(self, start, i):
+        # Comme "ConsumersWrapper", on avance jusqu'au prochain
+        # séparateur pour délimiter la zone de l'erreur.
+        source = self.str
+
+        while i < self.length:
+            char = source[i]
+
+            if char == '#':
+                i = self.skipComment(i)
+                continue
+            if char == ' ' or char == '\t' or char == '\n' or char == '"':
+                break
+
+            i += 1
+
+        raise TokenizerError(
+            (self.lines.pos(start), self.lines.pos(self.base + i)),
+            "Failed to tokenize this."
+        )
+
+    def nextToken(self):
+        # Renvoie un triplet (pair, start, end),
+        # où "start" et "end" sont des indices dans la source.
+        source = self.str
+        length = self.length
+        i = self.i
+
+        # Saute les espaces et les commentaires.
+        while True:
+            i = blankRun.match(source, i).end()
+
+            if i == length:
+                break
+
+            char = source[i]
+
+            if char == '\n':
+                i += 1
+                self.lines.newLine(self.base + i)
+            elif char == '#':
+                i = self.skipComment(i)
+            else:
+                break
+
+        start = self.base + i
+
+        if i == length:
+            self.i = i
+            return ((TokenType.EOF, None), start, start)
+
+        cls = charClass(char)
+
+        if cls == CharClass.WORD:
+            pair, i = self.readWord(start, i)
+        elif cls == CharClass.SYMBOL:
+            pair, end, i = self.readSymbol(start, i)
+            self.i = i
+            return (pair, start, end)
+        elif cls == CharClass.QUOTE:
+            pair, end, i = self.readString(start, i)
+            self.i = i
+            return (pair, start, end)
+        else:
+            self.fail(start, i + 1)
+
+        self.i = i
+        return (pair, start, self.base + i)
+
+    def readWord(self, start, i):
+        # Renvoie (pair, i).
+        source = self.str
+        length = self.length
+        pieces = []
+        wordStart = i
+
+        while True:
+            i = wordRun.match(source, i).end()
+
+            if i < length and source[i] == '#':
+                pieces.append(source[wordStart:i])
+                i = self.skipComment(i)
+                wordStart = i
+                continue
+
+            break
+
+        pieces.append(source[wordStart:i])
+        word = "".join(pieces)
+        keyword = keywordTable.get(word)
+
+        if keyword != None:
+            return (TokenType.KEYWORD, keyword), i
+
+        if str.isnumeric(word[0]):
+            if not (str.isascii(word) and str.isdigit(word)):
+                self.fail(start, i)
+            return (TokenType.NUMBER, int(word)), i
+
+        return (TokenType.IDENTIFIER, word), i
+
+    def readSymbol(self, start, i):
+        # Renvoie (pair, end, i).
+        source = self.str
+        length = self.length
+        symbol, children = symbolTrie[source[i]]
+        i += 1
+
+        if len(children) == 0:
+            return (TokenType.SYMBOL, symbol), self.base + i, i
+
+        while True:
+            while i < length and source[i] == '#':
+                i = self.skipComment(i)
+
+            if i == length or not source[i] in children:
+                break
+
+            last = self.base + i
+            symbol, children = children[source[i]]
+            i += 1
+
+            if len(children) == 0:
+                return (TokenType.SYMBOL, symbol), last, i
+
+        if symbol == None:
+            self.fail(start, i)
+
+        return (TokenType.SYMBOL, symbol), self.base + i, i
+
+    def readString(self, start, i):
+        # Renvoie (pair, end, i).
+        # Le texte entre deux caractères spéciaux ('"', '\\' et '#')
+        # est directement découpé dans la source.
+        source = self.str
+        length = self.length
+        pieces = []
+        i += 1
+
+        while True:
+            end = stringRun.match(source, i).end()
+
+            if end != i:
+                pieces.append(source[i:end])
+                i = end
+
+            if i == length:
+                break
+
+            char = source[i]
+
+            if char == '#':
+                i = self.skipComment(i)
+            elif char == '"':
+                return (
+                    (TokenType.STRING, "".join(pieces)), self.base + i,
+                    i + 1
+                )
+            else:
+                # Un retour à la ligne dans une chaîne n'en est pas un
+                # pour "self.lines" : tout se passe sur la même ligne.
+                (line, col) = self.lines.pos(self.base + i)
+
+                if i + 1 == length:
+                    raise TokenizerError(
+                        ((line, col), (line, col + 1)),
+                        "Unexpected EOF after '\\'."
+                    )
+
+                escape = source[i + 1]
+
+                if not escape in escapeTable:
+                    raise TokenizerError(
+                        ((line, col), (line, col + 2)),
+                        "Unknown escape sequence."
+                    )
+
+                pieces.append(escapeTable[escape])
+                i += 2
+
+        return (TokenType.STRING, "".join(pieces)), self.base + i, i
+
+class StreamLexer(TableLexer):
+    # Variante de "TableLexer" qui lit sa source par morceaux : fichier
+    # (texte ou binaire), "bytes", "mmap"... Seule une fenêtre de la
+    # source est gardée en mémoire ("self.str"), la partie déjà lue
+    # étant oubliée au fur et à mesure.
+
+    def __init__(self, source, chunkSize=1 << 16):
+        super().__init__("")
+        self.chunkSize = chunkSize
+        self.exhausted = False
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+
+        if hasattr(source, "read"):
+            self.readChunk = source.read
+        else:
+            offset = 0
+
+            def readChunk(size):
+                nonlocal offset
+                chunk = source[offset:offset+size]
+                offset += len(chunk)
+                return chunk
+
+            self.readChunk = readChunk
+
+    def refill(self, size):
+        # Ajoute du texte à la fenêtre (sauf si la source est épuisée).
+        while not self.exhausted:
+            chunk = self.readChunk(size)
+            final = len(chunk) == 0
+
+            if not isinstance(chunk, str):
+                chunk = self.decoder.decode(chunk, final)
+
+            self.exhausted = final
+            self.str += chunk
+            self.length = len(self.str)
+
+            if len(chunk) != 0:
+                return
+
+    def nextToken(self):
+        if self.i >= self.chunkSize:
+            self.str = self.str[self.i:]
+            self.length = len(self.str)
+            self.base += self.i
+            self.i = 0
+
+        if self.length - self.i < self.chunkSize:
+            self.refill(self.chunkSize)
+
+        state = (self.i, self.lines.count())
+
+        while True:
+            token = None
+
+            try:
+                token = super().nextToken()
+            except TokenizerError:
+                if self.exhausted:
+                    raise
+
+            if token != None and (self.exhausted or self.i < self.length):
+                return token
+
+            # Le token touche la fin de la fenêtre : il est peut-être
+            # incomplet, on recommence avec une fenêtre plus grande.
+            (self.i, lineCount) = state
+            self.lines.truncate(lineCount)
+            self.refill(max(self.chunkSize, self.length))
+
 class Tokenizer:
-    def __init__(self, str):
-        self.wrapper = ConsumersWrapper(str)
+    def __init__(self, source, legacy=False, start=None):
+        # "source" est soit le code source, soit un objet fichier,
+        # des "bytes" ou un "mmap" (lus alors par morceaux).
+        # "legacy" permet de revenir à l'ancien tokenizer
+        # (un "Recognizer" par type de token), qui ne lit que des "str".
+        # "start" situe "source" lorsque ce n'est qu'un fragment du
+        # code source (voir "TableLexer").
+        # Sauf pour l'ancien tokenizer, les tokens sont rangés dans
+        # "self.buffer", et leurs positions calculées à la demande.
+        self.buffer = None
+
+        if not isinstance(source, str):
+            self.wrapper = StreamLexer(source)
+        elif legacy:
+            self.wrapper = ConsumersWrapper(source)
+        else:
+            self.wrapper = TableLexer(source, start)
+
+        if not legacy or not isinstance(source, str):
+            self.buffer = TokenBuffer(self.wrapper.lines)
+
         self._current = None
         self._lookahead = None
         self.nextToken()
 
     def nextToken(self):
         (pair, start, end) = self.wrapper.nextToken()
-        token = Token(pair, start, end)
+
+        if self.buffer == None:
+            token = Token(pair, start, end)
+        else:
+            token = self.buffer.append(pair, start, end)
+
         (self._current, self._lookahead) = (self._lookahead, token)
         return self._current
 
+    def forgetParsed(self):
+        # Oublie les tokens qui précèdent "self.current()" : à appeler
+        # quand plus aucun d'entre eux n'est utilisé (par exemple entre
+        # deux fonctions).
+        if self.buffer != None and self._current != None:
+            self.buffer.forget(self._current.index)
+
     def current(self):
         return self._current
 
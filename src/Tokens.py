@@ -1,6 +1,10 @@
-from enum import Enum, auto
+from array import array
+from bisect import bisect_right
+from enum import Enum, IntEnum, auto
 
-class TokenType(Enum):
+from program_types import NotImplemented
+
+class TokenType(IntEnum):
     # Token "virtuel", utilisé par le parseur
     # Représente un fragement de texte qui a déjà été parsé.
     PARSED = auto()
@@ -12,6 +16,10 @@ class TokenType(Enum):
     STRING = auto()
 
 class Symbol(Enum):
+    # Les membres sont uniques : le hash par identité suffit, et évite
+    # l'appel à "Enum.__hash__" à chaque recherche dans un dictionnaire.
+    __hash__ = object.__hash__
+
     LPAR = '('
     RPAR = ')'
     LBRACKET = '{'
@@ -38,6 +46,8 @@ class Symbol(Enum):
     RARROW = '->'
 
 class Keyword(Enum):
+    __hash__ = object.__hash__
+
     RETURN = 'return'
     FN = 'fn'
 
@@ -61,6 +71,8 @@ class Keyword(Enum):
     LET = 'let'
 
 class Token:
+    __slots__ = ("pair", "start", "end")
+
     def __init__(self, pair, start, end):
         self.pair = pair
         self.start = start
@@ -112,3 +124,145 @@ class Token:
         token = getTokenRepresentation()
 
         return "({}, {})".format(tokentype, token)
+
+class LineIndex:
+    # Indices (dans la source) des débuts de ligne : permet de retrouver
+    # le couple (ligne, colonne) d'un indice seulement quand on en a
+    # besoin (message d'erreur, sourcemap...).
+
+    def __init__(self, offset=0, line=1):
+        # "offset" est l'indice du début de la ligne "line" : utile
+        # pour ne lire qu'un fragment de la source.
+        self.starts = array('q', [offset])
+        # Numéros de ligne partagés par toutes les positions
+        # d'une même ligne (au lieu d'un entier par position).
+        self.numbers = [line]
+
+    def newLine(self, offset):
+        self.starts.append(offset)
+        self.numbers.append(self.numbers[-1] + 1)
+
+    def count(self):
+        return len(self.starts)
+
+    def truncate(self, count):
+        del self.starts[count:]
+        del self.numbers[count:]
+
+    def pos(self, offset):
+        starts = self.starts
+        last = starts[-1]
+
+        # Cas le plus fréquent : la dernière ligne lue.
+        if offset >= last:
+            return (self.numbers[-1], offset - last + 1)
+
+        line = bisect_right(starts, offset)
+        return (self.numbers[line - 1], offset - starts[line - 1] + 1)
+
+# Les codes de "TokenType" sont ses valeurs entières.
+tokenTypes = [None for _ in range(len(TokenType) + 1)]
+for type in TokenType:
+    tokenTypes[type] = type
+
+class TokenBuffer:
+    # Tokens rangés par colonnes : type, indice de la valeur dans
+    # "self.valueTable" (chaque valeur n'y apparaît qu'une fois),
+    # et indices de début et de fin dans la source.
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.types = array('B')
+        self.values = array('L')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.valueTable = []
+        self.valueIds = {}
+        # Numéro du premier token encore présent dans les colonnes.
+        self.first = 0
+
+    def valueId(self, value):
+        id = self.valueIds.get(value)
+
+        if id == None:
+            id = len(self.valueTable)
+            self.valueTable.append(value)
+            self.valueIds[value] = id
+
+        return id
+
+    def append(self, pair, start, end):
+        # Range le token et renvoie un "BufferedToken" qui le désigne.
+        (type, value) = pair
+        id = self.valueIds.get(value)
+
+        if id == None:
+            id = self.valueId(value)
+        else:
+            # La valeur déjà rangée est partagée par tous les tokens
+            # (et donc tous les noeuds de l'AST) qui l'utilisent.
+            pair = (type, self.valueTable[id])
+
+        self.types.append(type)
+        self.values.append(id)
+        self.starts.append(start)
+        self.ends.append(end)
+        return BufferedToken(self, self.first + len(self.types) - 1, pair)
+
+    def column(self, index):
+        # Renvoie l'indice du token "index" dans les colonnes. Un token
+        # oublié (voir "forget") ne doit plus être lu : un indice
+        # négatif lirait silencieusement la fin des colonnes.
+        k = index - self.first
+
+        if k < 0:
+            raise NotImplemented()
+
+        return k
+
+    def pair(self, index):
+        k = self.column(index)
+        return (tokenTypes[self.types[k]], self.valueTable[self.values[k]])
+
+    def pos(self, index):
+        k = self.column(index)
+        return (self.lines.pos(self.starts[k]), self.lines.pos(self.ends[k]))
+
+    def forget(self, index):
+        # Oublie les tokens de numéro strictement inférieur à "index".
+        count = index - self.first
+        kept = [self.valueTable[id] for id in self.values[count:]]
+
+        del self.types[:count]
+        del self.starts[:count]
+        del self.ends[:count]
+        self.first = index
+
+        self.values = array('L')
+        self.valueTable = []
+        self.valueIds = {}
+
+        for value in kept:
+            self.values.append(self.valueId(value))
+
+class BufferedToken(Token):
+    # Token lu dans un "TokenBuffer" : sa position
+    # n'est calculée que si on la demande.
+    __slots__ = ("buffer", "index", "resolved")
+
+    def __init__(self, buffer, index, pair=None):
+        # "pair" évite de relire le type et la valeur dans "buffer"
+        # quand on vient de les y ranger.
+        if pair == None:
+            pair = buffer.pair(index)
+
+        self.pair = pair
+        self.buffer = buffer
+        self.index = index
+        self.resolved = None
+
+    def pos(self):
+        if self.resolved == None:
+            self.resolved = self.buffer.pos(self.index)
+
+        return self.resolved
@@ -15,21 +15,39 @@ class Varstack():
 
     def __init__(self, functions):
         self.functions = functions
+        # Les fonctions appelées, avec leur type (voir "compileProgram").
+        self.called = {}
+        # Chaque contexte est la liste de ses entrées
+        # ((flag, name), var), dans l'ordre de création.
         self.varstack = []
-        self.reserved = []
+        # Pour chaque nom, la pile des variables (ou des boucles) de ce
+        # nom encore visibles : la dernière masque les précédentes.
+        # "popContext" dépile les entrées du contexte qu'il ferme.
+        self.vars = {}
+        self.loops = {}
+        # Les boucles (hors boucles générées) encore visibles.
+        self.loopStack = []
+        self.reserved = {}
         self.letMode = False
         self.all = []
         self.nextLoopId = 0
+        self.typeIds = TypeIds()
+        # Les couples (typeId(ltype), typeId(rtype)) déjà acceptés par
+        # "assertTypeMatch", les signatures d'appel déjà acceptées par
+        # "flattenCall", et le type de retour instancié pour chacune,
+        # dans cette fonction.
+        self.matchedTypes = set()
+        self.checkedCalls = set()
+        self.instantiatedReturns = {}
 
     def findFunctionType(self, name, pos):
         # "pos" est utilisé pour le sourcemapping des exceptions.
+        # "self.functions" associe son type au nom de chaque fonction.
+        type = self.functions.get(name)
 
-        for fname, type in self.functions[::-1]:
-            if fname == name:
-                return type
-
-        print(name)
-        print(self.functions)
+        if type != None:
+            self.called[name] = type
+            return type
 
         raise ASTError(pos, "Can't find function {}.".format(name))
         # TODO: Should produce a propper error.
@@ -39,41 +57,28 @@ class Varstack():
         if self.letMode:
             # On peut créer des variables,
             # mais pas assigner des variables réservées.
-            for varname, var in self.reserved:
-                if varname == name:
-                    raise FlattenError(
-                        var.pos(), pos,
-                        "Can't define a variable twice in a let."
-                    )
+            if name in self.reserved:
+                raise FlattenError(
+                    self.reserved[name].pos(), pos,
+                    "Can't define a variable twice in a let."
+                )
 
             var = TypedVar(pos, None, self.varstack[-1])
             self.varstack[-1].append(((Varstack.Flag.VAR, name), var))
-            self.reserved.append((name, var))
+            self.vars.setdefault(name, []).append(var)
+            self.reserved[name] = var
             return var
         else:
             # On cherche la variable si elle a déjà été définie,
             # et on lève une exception si elle ne l'a jamais été.
-            for vars in self.varstack[::-1]:
-                for (flag, varname), var in vars[::-1]:
-                    if flag != Varstack.Flag.VAR:
-                        continue
-                    if varname == name:
-                        return var
-
-            raise ASTError(
-                pos,
-                "This variable has never been defined."
-            )
-        return var
+            return self.findVar(name, pos)
 
     def findLoop(self, name, pos):
-        # Même principe que "findOrCreateVar" lorsque "letMode = False".
-        for vars in self.varstack[::-1]:
-            for (flag, varname), var in vars[::-1]:
-                if flag != Varstack.Flag.LOOP:
-                    continue
-                if varname == name:
-                    return var
+        # Même principe que "findVar".
+        loops = self.loops.get(name)
+
+        if loops:
+            return loops[-1]
 
         raise ASTError(
             pos,
@@ -84,10 +89,8 @@ class Varstack():
         # On cherche simplement une boucle.
         # (Une boucle définie par l'utilisateur, pas une boucle
         # générée par le compilateur.)
-        for vars in self.varstack[::-1]:
-            for (flag, varname), var in vars[::-1]:
-                if flag == Varstack.Flag.LOOP:
-                    return var
+        if len(self.loopStack) != 0:
+            return self.loopStack[-1]
 
         raise ASTError(
             pos,
@@ -113,15 +116,13 @@ class Varstack():
             pos, None, self.varstack[-1], self._generateLoopId()
         )
         self.varstack[-1].append(((Varstack.Flag.LOOP, name), var))
+        self.loops.setdefault(name, []).append(var)
+        self.loopStack.append(var)
         return var
 
     def createUnnamedLoop(self, pos):
         # Renvoie un couple (id, var).
-        var = LoopVar(
-            pos, None, self.varstack[-1], self._generateLoopId()
-        )
-        self.varstack[-1].append(((Varstack.Flag.LOOP, None), var))
-        return var
+        return self.createLoop(pos, None)
 
     def createGeneratedLoop(self, pos):
         # Renvoie un couple (id, var).
@@ -134,13 +135,10 @@ class Varstack():
     def findVar(self, name, pos):
         # Recherche la variable dans "self.varstack".
         # Lève une exception si la variable n'est pas définie.
+        vars = self.vars.get(name)
 
-        for vars in self.varstack[::-1]:
-            for (flag, varname), var in vars[::-1]:
-                if flag != Varstack.Flag.VAR:
-                    continue
-                if varname == name:
-                    return var
+        if vars:
+            return vars[-1]
 
         raise ASTError(
             pos,
@@ -150,7 +148,7 @@ class Varstack():
     def enableLetMode(self):
         # Permet de créer des variables
         # pour une lvalue dans un "let".
-        self.reserved = []
+        self.reserved = {}
         self.letMode = True
 
     def disableLetMode(self):
@@ -166,6 +164,16 @@ class Varstack():
         vars = []
         i = len(self.all)
 
+        # Les noms du contexte ne sont plus visibles. Ce sont forcément
+        # les derniers de leurs piles : on ne crée de variable ou de
+        # boucle nommée que dans le contexte du sommet.
+        for (flag, name), _ in reversed(top):
+            if flag == Varstack.Flag.VAR:
+                self.vars[name].pop()
+            elif flag == Varstack.Flag.LOOP:
+                self.loops[name].pop()
+                self.loopStack.pop()
+
         for _, var in top:
             if var.virtualType != VirtualVarType.REAL:
                 continue
@@ -0,0 +1,233 @@
+import heapq
+
+from flatIR import *
+
+# Attribution des emplacements (les "vN" du code généré) aux variables
+# d'une fonction : deux variables qui ne sont jamais vivantes en même
+# temps peuvent partager le même emplacement.
+#
+# Les commandes sont d'abord mises à plat en un graphe de flot de
+# contrôle, dont les nœuds sont numérotés dans l'ordre du code. On
+# calcule la vivacité des variables sur ce graphe (les ensembles de
+# variables sont des entiers, un bit par "id"), puis l'intervalle des
+# nœuds où chaque variable est définie ou vivante en sortie. Deux
+# variables dont les intervalles se chevauchent reçoivent des
+# emplacements différents ("linear scan"). Les copies entre deux
+# variables qui partagent un emplacement sont ensuite supprimées.
+
+def bits(mask):
+    while mask != 0:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+class FlowGraph:
+    def __init__(self):
+        # Pour chaque nœud : variables lues, variables écrites,
+        # successeurs et commande d'origine (ou None).
+        self.uses = []
+        self.defs = []
+        self.succs = []
+        self.commands = []
+        # Les nœuds dont le successeur est le prochain nœud créé.
+        self.pending = []
+        # Pour chaque boucle ouverte, les nœuds qui en sortent.
+        self.exits = {}
+        self.vars = {}
+
+    def mask(self, vars):
+        mask = 0
+
+        for var in vars:
+            if var.id < 0:
+                continue
+            self.vars[id(var)] = var
+            mask |= 1 << var.id
+
+        return mask
+
+    def add(self, uses, defs, command=None):
+        node = len(self.uses)
+        self.uses.append(self.mask(uses))
+        self.defs.append(self.mask(defs))
+        self.succs.append([])
+        self.commands.append(command)
+
+        for pred in self.pending:
+            self.succs[pred].append(node)
+
+        self.pending = [node]
+        return node
+
+    def addCommands(self, commands):
+        for comm in commands:
+            if isinstance(comm, Assign):
+                self.add(operandVars([comm.r]), [comm.l], comm)
+            elif isinstance(comm, FlatCallBase):
+                self.add(operandVars(comm.input), comm.output, comm)
+            elif isinstance(comm, TypedIf):
+                cond = self.add(operandVars([comm.cond]), [], comm)
+                self.addCommands(comm.aIfTrue)
+                pendingIfTrue = self.pending
+                self.pending = [cond]
+                self.addCommands(comm.aElse)
+                self.pending = pendingIfTrue + self.pending
+            elif isinstance(comm, TypedLoop):
+                head = self.add([], [], comm)
+                self.exits[comm.loopid] = []
+                self.addCommands(comm.commands)
+
+                for pred in self.pending:
+                    self.succs[pred].append(head)
+
+                self.pending = self.exits.pop(comm.loopid)
+            elif isinstance(comm, TypedBreak):
+                if not comm.loopid in self.exits:
+                    raise NotImplemented()
+
+                node = self.add([], [], comm)
+                self.exits[comm.loopid].append(node)
+                self.pending = []
+            else:
+                self.add(operandVars([comm]), [], comm)
+
+    def liveOut(self, optional=()):
+        # Renvoie, pour chaque nœud, les variables vivantes en sortie.
+        # Les nœuds de "optional" ne lisent leurs variables que si
+        # l'une de celles qu'ils écrivent est vivante en sortie.
+        count = len(self.uses)
+        liveIn = [0] * count
+        liveOut = [0] * count
+        changed = True
+
+        # Les nœuds sont dans l'ordre du code : en les parcourant à
+        # l'envers, il faut à peu près autant de passes que de niveaux
+        # de boucles imbriquées.
+        while changed:
+            changed = False
+
+            for node in range(count - 1, -1, -1):
+                out = 0
+
+                for succ in self.succs[node]:
+                    out |= liveIn[succ]
+
+                live = out & ~self.defs[node]
+                liveOut[node] = out
+
+                if not node in optional or out & self.defs[node] != 0:
+                    live |= self.uses[node]
+
+                if live != liveIn[node]:
+                    liveIn[node] = live
+                    changed = True
+
+        return liveOut
+
+def operandVars(operands):
+    vars = []
+    stack = list(operands)
+
+    while len(stack) != 0:
+        operand = stack.pop()
+
+        if isinstance(operand, TypedVar):
+            vars.append(operand)
+        elif isinstance(operand, Arith):
+            stack.extend(operand.operands)
+        elif isinstance(operand, Unary):
+            stack.append(operand.target)
+        elif isinstance(operand, TypedCmp):
+            stack.append(operand.lop)
+            stack.append(operand.rop)
+        elif isinstance(operand, Tuple):
+            stack.extend(operand.contents)
+
+    return vars
+
+def removeSelfCopies(commands):
+    # Renvoie "commands" sans les copies d'une variable vers une autre
+    # qui a reçu le même emplacement : elles ne font plus rien.
+    kept = []
+
+    for comm in commands:
+        if (
+            isinstance(comm, Assign) and isinstance(comm.r, TypedVar) and
+            comm.l.virtualType == VirtualVarType.REAL and
+            comm.r.virtualType == VirtualVarType.REAL and
+            comm.l.id == comm.r.id
+        ):
+            continue
+
+        if isinstance(comm, TypedIf):
+            comm.aIfTrue = removeSelfCopies(comm.aIfTrue)
+            comm.aElse = removeSelfCopies(comm.aElse)
+        elif isinstance(comm, TypedLoop):
+            comm.commands = removeSelfCopies(comm.commands)
+
+        kept.append(comm)
+
+    return kept
+
+def allocateSlots(function):
+    # Renumérote les variables de "function" (voir plus haut).
+    graph = FlowGraph()
+    # Les arguments sont définis à l'entrée de la fonction, et la
+    # valeur de retour est lue à la sortie.
+    graph.add([], function.args)
+    graph.addCommands(function.commands)
+    graph.add(operandVars(function.value), [])
+    liveOut = graph.liveOut()
+
+    start = {}
+    end = {}
+    seen = 0
+
+    for node, out in enumerate(liveOut):
+        occurs = out | graph.defs[node]
+
+        for varId in bits(occurs & ~seen):
+            start[varId] = node
+
+        seen |= occurs
+
+    seen = 0
+
+    for node in range(len(liveOut) - 1, -1, -1):
+        occurs = liveOut[node] | graph.defs[node]
+
+        for varId in bits(occurs & ~seen):
+            end[varId] = node
+
+        seen |= occurs
+
+    # Les emplacements libérés sont réutilisés par ordre croissant.
+    slots = {}
+    active = []
+    free = []
+    nextSlot = 0
+
+    for varId in sorted(start, key=lambda varId: (start[varId], varId)):
+        while len(active) != 0 and active[0][0] < start[varId]:
+            _, slot = heapq.heappop(active)
+            heapq.heappush(free, slot)
+
+        if len(free) != 0:
+            slot = heapq.heappop(free)
+        else:
+            slot = nextSlot
+            nextSlot += 1
+
+        slots[varId] = slot
+        heapq.heappush(active, (end[varId], slot))
+
+    # Une variable qui n'apparaît dans aucun intervalle n'est jamais
+    # lue : son emplacement n'a pas d'importance.
+    for var in function.vars:
+        graph.vars[id(var)] = var
+
+    for var in graph.vars.values():
+        if var.id >= 0:
+            var.setId(slots.get(var.id, 0))
+
+    function.commands = removeSelfCopies(function.commands)
@@ -0,0 +1,414 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from AST import ASTError
+from program_types import NotImplemented
+from flatIR import FlattenError, FlatCall, TypedIf, TypedLoop
+from Varstack import Varstack
+from flatten import flattenFunction
+from allocateSlots import allocateSlots
+from propagateCopies import (
+    propagateCopies, removeDeadAssigns, forwardConditions, countCommands
+)
+from shareSubexpressions import shareSubexpressions
+from eliminateTailCalls import eliminateTailCalls
+from hoistInvariants import hoistInvariants
+from inlineFunctions import (
+    calledFunctions, recursiveFunctions, Splicer, canSplice, copyFunction
+)
+from transpile import transpileFunction
+
+# Le programme compilé par le pool : les processus (créés par "fork")
+# en héritent, seuls les indices des fonctions et les résultats passent
+# d'un processus à l'autre.
+forkedProgram = None
+
+# Une fonction grossit d'au plus "inlineGrowth" fois le seuil de
+# l'"Inliner" quand on y recopie les fonctions qu'elle appelle.
+inlineGrowth = 8
+
+def optimizeFunction(flat, stats):
+    # Ajoute à "stats" le bilan des optimisations (voir "newStats").
+    (folded, pruned) = propagateCopies(flat)
+    shared = shareSubexpressions(flat)
+
+    if len(shared) != 0:
+        # Les valeurs partagées sont relues par des copies.
+        (moreFolded, morePruned) = propagateCopies(flat)
+        folded += moreFolded
+        pruned += morePruned
+
+    (copies, others) = removeDeadAssigns(flat)
+    stats["folded"] += folded
+    stats["pruned"] += pruned
+    stats["copies"] += copies
+    stats["others"] += others
+
+    for kind, count in shared.items():
+        stats["shared"][kind] = stats["shared"].get(kind, 0) + count
+
+def newStats():
+    return {
+        "before": 0, "folded": 0, "pruned": 0, "copies": 0, "others": 0,
+        "forwarded": 0, "inlined": 0, "tailCalls": 0, "hoisted": 0,
+        "shared": {}
+    }
+
+def optimizedIR(functions, ast, inliner):
+    # Aplatit et optimise la fonction "ast", en y recopiant les
+    # fonctions qu'elle appelle si "inliner" n'est pas None.
+    # Renvoie le triplet (flat, called, stats), où "called" associe
+    # leur type aux fonctions appelées, y compris par les fonctions
+    # recopiées (comme "Varstack.called").
+    varstack = Varstack(functions)
+    flat = flattenFunction(varstack, ast.type, ast)
+    stats = newStats()
+    stats["before"] = countCommands(flat.commands)
+    called = dict(varstack.called)
+    optimizeFunction(flat, stats)
+    stats["tailCalls"] = eliminateTailCalls(flat)
+
+    if stats["tailCalls"] != 0:
+        optimizeFunction(flat, stats)
+
+    if inliner != None:
+        stats["inlined"] = inliner.inlineCalls(flat, called)
+
+        if stats["inlined"] != 0:
+            optimizeFunction(flat, stats)
+
+    stats["hoisted"] = hoistInvariants(flat)
+    stats["forwarded"] = forwardConditions(flat)
+    return flat, called, stats
+
+class Inliner:
+    # Recopie des fonctions à la place de leurs appels (voir
+    # "inlineFunctions") : celles qui ne sont pas récursives, et dont
+    # l'IR optimisé (où l'on a déjà recopié les fonctions qu'elles
+    # appellent) a au plus "threshold" instructions.
+    # Chaque processus du pool a sa copie de l'"Inliner", et donc
+    # prépare les fonctions de son côté : le résultat ne dépend que du
+    # programme.
+    def __init__(self, functions, asts, threshold):
+        self.functions = functions
+        self.asts = {ast.name: ast for ast in asts}
+        self.threshold = threshold
+        self.graph = {
+            name: calledFunctions(ast) for name, ast in self.asts.items()
+        }
+        self.recursive = recursiveFunctions(self.graph)
+        # Nom -> quadruplet (flat, called, stats, size) (voir
+        # "optimizedIR"), où "size" est le nombre d'instructions de
+        # "flat", ou None si la fonction n'a pas pu être compilée.
+        self.prepared = {}
+
+    def prepare(self, name):
+        # Renvoie le quadruplet de "self.prepared" pour "name". Les
+        # fonctions qu'on peut y recopier sont préparées avant elle,
+        # avec une pile explicite : elles ne forment pas de cycle.
+        stack = [name]
+
+        while len(stack) != 0:
+            top = stack[-1]
+
+            if top in self.prepared:
+                stack.pop()
+                continue
+
+            pending = [
+                callee for callee in sorted(self.graph[top])
+                if callee in self.asts and
+                not callee in self.recursive and
+                not callee in self.prepared
+            ]
+
+            if len(pending) != 0:
+                stack.extend(pending)
+                continue
+
+            stack.pop()
+
+            # L'erreur d'une fonction incorrecte sera levée quand on la
+            # compilera elle-même (voir "compileFunction").
+            try:
+                (flat, called, stats) = optimizedIR(
+                    self.functions, self.asts[top], self
+                )
+                self.prepared[top] = (
+                    flat, called, stats, countCommands(flat.commands)
+                )
+            except (ASTError, FlattenError, NotImplemented):
+                self.prepared[top] = None
+
+        return self.prepared[name]
+
+    def body(self, name):
+        # Renvoie le quadruplet de "prepare" si l'on peut recopier
+        # "name", None sinon.
+        if name in self.recursive or not name in self.asts:
+            return None
+
+        prepared = self.prepare(name)
+
+        if prepared == None or prepared[3] > self.threshold:
+            return None
+
+        return prepared
+
+    def candidates(self, commands, depth, out):
+        # Ajoute à "out" les triplets (depth, call, body) des appels de
+        # "commands" qu'on peut remplacer, où "depth" est le nombre de
+        # boucles qui contiennent l'appel.
+        for comm in commands:
+            if isinstance(comm, FlatCall):
+                body = self.body(comm.target)
+
+                if body != None and canSplice(comm, body[0]):
+                    out.append((depth, comm, body))
+            elif isinstance(comm, TypedIf):
+                self.candidates(comm.aIfTrue, depth, out)
+                self.candidates(comm.aElse, depth, out)
+            elif isinstance(comm, TypedLoop):
+                self.candidates(comm.commands, depth + 1, out)
+
+        return out
+
+    def inlineCalls(self, function, called):
+        # Recopie dans "function" les fonctions qu'elle appelle, et
+        # complète "called". Renvoie le nombre d'appels remplacés.
+        # Les passes suivantes ne sont pas linéaires en la taille de la
+        # fonction : on ne lui ajoute pas plus de "inlineGrowth" fois le
+        # seuil en instructions, en commençant par les appels des
+        # boucles les plus imbriquées.
+        candidates = self.candidates(function.commands, 0, [])
+        candidates.sort(key=lambda candidate: -candidate[0])
+        budget = inlineGrowth * self.threshold
+        selected = {}
+
+        for _, call, body in candidates:
+            if body[3] <= budget:
+                budget -= body[3]
+                selected[id(call)] = body
+
+        if len(selected) == 0:
+            return 0
+
+        splicer = Splicer(function)
+
+        def inlineInCommands(commands):
+            out = []
+
+            for comm in commands:
+                body = selected.get(id(comm))
+
+                if body != None:
+                    out.extend(splicer.splice(comm, body[0]))
+                    called.update(body[1])
+                    continue
+
+                if isinstance(comm, TypedIf):
+                    comm.aIfTrue = inlineInCommands(comm.aIfTrue)
+                    comm.aElse = inlineInCommands(comm.aElse)
+                elif isinstance(comm, TypedLoop):
+                    comm.commands = inlineInCommands(comm.commands)
+
+                out.append(comm)
+
+            return out
+
+        function.commands = inlineInCommands(function.commands)
+        return len(selected)
+
+def compileFunction(functions, ast, printIR, inliner=None):
+    # Aplatit puis transpile la fonction "ast". Chaque fonction a son
+    # propre "Varstack" (et donc ses propres numéros de variables et
+    # de boucles) : le résultat ne dépend que de la fonction, des
+    # types des fonctions qu'elle appelle, et du corps de celles qui
+    # peuvent être recopiées ("inliner", None pour n'en recopier
+    # aucune).
+    # Renvoie un quadruplet (ir, code, signatures, report), où "ir" est
+    # l'affichage de l'IR optimisé (None si "printIR" est faux),
+    # "signatures" la liste des couples (name, type_repr) des fonctions
+    # appelées (y compris par les fonctions recopiées) et "report" le
+    # bilan des optimisations.
+    prepared = None
+
+    if inliner != None:
+        prepared = inliner.prepare(ast.name)
+
+    if prepared != None:
+        # "allocateSlots" renumérote les variables : on garde l'IR
+        # préparé intact pour les fonctions où il sera recopié.
+        (flat, called, stats, _) = prepared
+        flat = copyFunction(flat)
+    else:
+        (flat, called, stats) = optimizedIR(functions, ast, None)
+
+    shared = stats["shared"]
+    report = "{}: {} -> {} instructions ({})".format(
+        ast.name, stats["before"], countCommands(flat.commands),
+        ", ".join([
+            "{} calls inlined".format(stats["inlined"]),
+            "{} tail calls eliminated".format(stats["tailCalls"]),
+            "{} operations folded".format(stats["folded"]),
+            "{} branches pruned".format(stats["pruned"]),
+            "{} copies removed".format(stats["copies"]),
+            "{} dead assignments removed".format(stats["others"]),
+            "{} conditions forwarded".format(stats["forwarded"]),
+            "{} invariants hoisted".format(stats["hoisted"]),
+            "{} evaluations shared{}".format(
+                sum(shared.values()),
+                "".join(
+                    " [{} {}]".format(count, kind)
+                    for kind, count in sorted(shared.items())
+                )
+            )
+        ])
+    )
+    ir = None
+
+    if printIR:
+        ir = flat.pretty(0)
+
+    allocateSlots(flat)
+    signatures = sorted(
+        (name, type.type_repr()) for name, type in called.items()
+    )
+    return ir, transpileFunction(flat), signatures, report
+
+def compileAt(index):
+    # Renvoie None si la compilation a échoué (voir "parseChunk").
+    (functions, asts, printIR, inliner) = forkedProgram
+
+    try:
+        return compileFunction(functions, asts[index], printIR, inliner)
+    except (ASTError, FlattenError, NotImplemented):
+        return None
+
+def compileInPool(functions, asts, printIR, jobs, inliner):
+    # Renvoie None si le pool est inutilisable.
+    global forkedProgram
+
+    try:
+        context = multiprocessing.get_context("fork")
+    except ValueError:
+        return None
+
+    forkedProgram = (functions, asts, printIR, inliner)
+    chunksize = max(1, len(asts) // (4 * jobs))
+
+    try:
+        with ProcessPoolExecutor(jobs, mp_context=context) as pool:
+            return list(
+                pool.map(compileAt, range(len(asts)), chunksize=chunksize)
+            )
+    except (OSError, BrokenProcessPool):
+        return None
+    finally:
+        forkedProgram = None
+
+def compileFunctions(functions, asts, printIR, jobs, inliner=None):
+    # Renvoie la liste des résultats de "compileFunction", dans l'ordre
+    # de "asts". Si une fonction n'a pas pu être compilée dans le pool,
+    # on recompile tout séquentiellement, pour lever exactement la même
+    # erreur.
+    if jobs > 1 and len(asts) > 1:
+        compiled = compileInPool(functions, asts, printIR, jobs, inliner)
+
+        if compiled != None and not None in compiled:
+            return compiled
+
+    return [
+        compileFunction(functions, ast, printIR, inliner) for ast in asts
+    ]
+
+def dependencies(signatures, threshold, sourceOf):
+    # Les fonctions appelées ont pu être recopiées (ou non, selon leur
+    # taille) : le code généré dépend aussi de leur texte ("sourceOf"
+    # associe sa clé dans le cache au nom de chaque fonction) et du
+    # seuil de l'"Inliner".
+    if threshold == 0:
+        return (0, [])
+
+    return (threshold, [sourceOf.get(name) for name, _ in signatures])
+
+def isUpToDate(functions, entry, printIR, threshold, sourceOf):
+    # Une entrée du cache reste valable tant que les fonctions qu'elle
+    # appelle gardent le même type (et le même texte, voir
+    # "dependencies").
+    (signatures, sources, ir, _, _) = entry
+
+    if printIR and ir == None:
+        return False
+
+    if sources != dependencies(signatures, threshold, sourceOf):
+        return False
+
+    for name, signature in signatures:
+        type = functions.get(name)
+
+        if type == None or type.type_repr() != signature:
+            return False
+
+    return True
+
+def compileProgram(
+    functions, asts, printIR, jobs=1, cache=None, sources=None,
+    inlineThreshold=0
+):
+    # Renvoie la liste des triplets (ir, code, report) des fonctions de
+    # "asts" (voir "compileFunction"). Avec un cache ("ASTCache"), on
+    # reprend le code déjà généré pour les fonctions dont le texte
+    # ("sources", voir "parseProgram") et la signature des fonctions
+    # appelées n'ont pas changé, et on ne compile que les autres.
+    # On recopie les fonctions d'au plus "inlineThreshold" instructions
+    # à la place de leurs appels (voir "Inliner").
+    results = [None] * len(asts)
+    sourceOf = {}
+
+    if cache != None:
+        sourceOf = {ast.name: source for ast, source in zip(asts, sources)}
+
+        entries = cache.loadAll(
+            [source for source in sources if source != None], ".code"
+        )
+        entries.reverse()
+
+        for n, source in enumerate(sources):
+            if source == None:
+                continue
+
+            entry = entries.pop()
+
+            if entry != None and isUpToDate(
+                functions, entry, printIR, inlineThreshold, sourceOf
+            ):
+                results[n] = entry[2:]
+
+    missing = [n for n in range(len(asts)) if results[n] == None]
+    inliner = None
+
+    if inlineThreshold > 0 and len(missing) != 0:
+        inliner = Inliner(functions, asts, inlineThreshold)
+
+    compiled = compileFunctions(
+        functions, [asts[n] for n in missing], printIR, jobs, inliner
+    )
+    stored = []
+
+    for n, (ir, code, signatures, report) in zip(missing, compiled):
+        results[n] = (ir, code, report)
+
+        if cache != None and sources[n] != None:
+            stored.append((sources[n], (
+                signatures,
+                dependencies(signatures, inlineThreshold, sourceOf),
+                ir, code, report
+            )))
+
+    if len(stored) != 0:
+        cache.storeAll(stored, ".code")
+        cache.evict()
+
+    return results
@@ -0,0 +1,125 @@
+from program_types import *
+from flatIR import *
+from allocateSlots import operandVars
+from propagateCopies import isCopy
+from inlineFunctions import maxLoopId
+
+# Élimination des appels récursifs terminaux.
+#
+# Un appel d'une fonction à elle-même dont le résultat est directement
+# renvoyé (un "appel terminal") n'a pas besoin d'un nouvel appel
+# Python : on réaffecte les arguments, et on recommence la fonction. Le
+# corps de la fonction est mis dans une boucle ; les appels terminaux
+# sont remplacés par l'affectation des arguments (la boucle recommence
+# alors), et les autres chemins qui atteignent la fin de la fonction
+# sortent de la boucle.
+#
+# Les copies qui suivent l'appel (vers les variables de la valeur de la
+# fonction, voir "flattenIf") sont recopiées à la fin de chaque chemin
+# qui sort de la boucle, et supprimées après les appels terminaux.
+
+class TailCalls:
+    def __init__(self, function, loopid):
+        self.function = function
+        self.loopid = loopid
+        self.nextId = 1 + max([var.id for var in function.vars], default=-1)
+        self.count = 0
+
+    def isTailCall(self, comm, after):
+        # Vrai si "comm" est un appel de la fonction à elle-même, dont
+        # les résultats, après les copies "after", sont exactement la
+        # valeur de la fonction.
+        if not (
+            isinstance(comm, FlatCall) and
+            comm.target == self.function.name
+        ):
+            return False
+
+        args = self.function.args
+        value = list(self.function.value)
+
+        if not (
+            len(comm.input) == len(args) and
+            len(comm.output) == len(value) and
+            all(arg.virtualType == VirtualVarType.REAL for arg in args)
+        ):
+            return False
+
+        # On remonte les copies : "value" devient la liste des
+        # variables dont la valeur est renvoyée, juste après l'appel.
+        for copy in reversed(after):
+            value = [copy.r if o is copy.l else o for o in value]
+
+        return all(a is b for a, b in zip(value, comm.output))
+
+    def rebind(self, call):
+        # Renvoie les commandes qui réaffectent les arguments de la
+        # fonction avec les opérandes de "call". Un argument encore lu
+        # par les opérandes suivants passe par un temporaire.
+        commands = []
+        pending = []
+        args = self.function.args
+
+        for i, (arg, operand) in enumerate(zip(args, call.input)):
+            if operand is arg:
+                continue
+
+            if arg in operandVars(call.input[i+1:]):
+                temp = TypedVar(call.pos(), arg.type, None)
+                temp.setId(self.nextId)
+                self.nextId += 1
+                self.function.vars.append(temp)
+                commands.append(Assign(call.pos(), temp, operand))
+                pending.append(Assign(call.pos(), arg, temp))
+            else:
+                commands.append(Assign(call.pos(), arg, operand))
+
+        return commands + pending
+
+    def lower(self, commands, after):
+        # Renvoie les commandes "commands" (suivies des copies "after"
+        # à la fin de la fonction) réécrites pour le corps de la
+        # boucle.
+        commands = list(commands)
+        after = list(after)
+
+        while len(commands) != 0 and isCopy(commands[-1]):
+            after.insert(0, commands.pop())
+
+        last = None
+
+        if len(commands) != 0:
+            last = commands[-1]
+
+        if isinstance(last, TypedIf):
+            commands[-1] = TypedIf(
+                last.pos(), last.cond,
+                self.lower(last.aIfTrue, after),
+                self.lower(last.aElse, after)
+            )
+            return commands
+
+        if self.isTailCall(last, after):
+            self.count += 1
+            return commands[:-1] + self.rebind(last)
+
+        # Les copies sont faites sur chaque chemin : ce ne sont pas les
+        # mêmes commandes (les passes suivantes les modifient).
+        for copy in after:
+            commands.append(Assign(copy.pos(), copy.l, copy.r))
+
+        commands.append(TypedBreak(self.function.pos(), self.loopid))
+        return commands
+
+def eliminateTailCalls(function):
+    # Renvoie le nombre d'appels terminaux remplacés.
+    tailCalls = TailCalls(function, 1 + maxLoopId(function.commands))
+    commands = tailCalls.lower(function.commands, [])
+
+    if tailCalls.count == 0:
+        return 0
+
+    function.commands = [
+        TypedLoop(function.pos(), tailCalls.loopid, commands)
+    ]
+    return tailCalls.count
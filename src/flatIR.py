@@ -19,8 +19,8 @@ class VoidValue(CodeEntity):
         super().__init__(pos)
         self.type = Void
 
-    def pretty(self, n):
-        return "(void)"
+    def prettyParts(self, n):
+        return ["(void)"]
 
 class Assign(CodeEntity):
     def __init__(self, pos, l, r):
@@ -28,8 +28,8 @@ class Assign(CodeEntity):
         self.l = l
         self.r = r
 
-    def pretty(self, n):
-        return "{} <- {}".format(self.l.pretty(n), self.r.pretty(n))
+    def prettyParts(self, n):
+        return [(self.l, n), " <- ", (self.r, n)]
 
 class VirtualVarType(Enum):
     REAL = auto()
@@ -61,30 +61,25 @@ class TypedVar(CodeEntity):
         else:
             return self.type.type_repr()
 
-    def pretty(self, n):
+    def prettyParts(self, n):
         if self.virtualType == VirtualVarType.TUPLE:
-            contents = ""
-
-            for c in self.virtualContents:
-                contents += "\n{}{},".format(tabs(n+2), c.pretty(n+2))
-
             return (
-                "(\n{}virt. {}," +
-                "\n{}contents=[{}\n{}]\n{})"
-            ).format(
-                tabs(n+1),
-                self.type_repr(),
-                tabs(n+1),
-                contents,
-                tabs(n+1),
-                tabs(n)
+                [
+                    "(\n{}virt. {},\n{}contents=[".format(
+                        tabs(n+1),
+                        self.type_repr(),
+                        tabs(n+1)
+                    )
+                ] +
+                prettyItems(self.virtualContents, n+2, n+2) +
+                ["\n{}]\n{})".format(tabs(n+1), tabs(n))]
             )
         else:
             repr = "None"
             if self.type != None:
                 repr = self.type.type_repr()
 
-            return "({}: {})".format(self.id, repr)
+            return ["({}: {})".format(self.id, repr)]
 
 class LoopVar(TypedVar):
     def __init__(self, pos, type, context, loopid):
@@ -98,8 +93,8 @@ class TypedConstant(Constant):
     def type_repr(self):
         return self.type.type_repr()
 
-    def pretty(self, n):
-        return "({})".format(self.type_repr())
+    def prettyParts(self, n):
+        return ["({})".format(self.type_repr())]
 
 class TypedTuple(Tuple):
     # Dans cette représentation des "Tuples", la structure
@@ -114,22 +109,17 @@ class TypedTuple(Tuple):
     def type_repr(self):
         return self.type.type_repr()
 
-    def pretty(self, n):
-        contents = ""
-
-        for c in self.contents:
-            contents += "\n{}{},".format(tabs(n+2), c.pretty(n+2))
-
+    def prettyParts(self, n):
         return (
-            "TypedTuple(\n{}type={}," +
-            "\n{}contents=[{}\n{}]\n{})"
-        ).format(
-            tabs(n+1),
-            self.type_repr(),
-            tabs(n+1),
-            contents,
-            tabs(n+1),
-            tabs(n)
+            [
+                "TypedTuple(\n{}type={},\n{}contents=[".format(
+                    tabs(n+1),
+                    self.type_repr(),
+                    tabs(n+1)
+                )
+            ] +
+            prettyItems(self.contents, n+2, n+2) +
+            ["\n{}]\n{})".format(tabs(n+1), tabs(n))]
         )
 
 class TypedArith(Arith):
@@ -148,24 +138,22 @@ class TypedCmp(CodeEntity):
         self.op = op
         self.rop = rop
 
-    def pretty(self, n):
-        return "TypedCmp(\n{}lop={}\n{}op={}\n{}rop={}\n{})".format(
-            tabs(n+1),
-            self.lop.pretty(n+1),
-            tabs(n+1),
-            self.op.pretty(n+1),
-            tabs(n+1),
-            self.rop.pretty(n+1),
-            tabs(n)
-        )
-
-def prettyCommands(commands):
-    out = ""
-
-    for c in commands:
-        out += "\n{}{},".format(tabs(n+2), c.pretty(n+2))
+    def prettyParts(self, n):
+        return [
+            "TypedCmp(\n{}lop=".format(tabs(n+1)),
+            (self.lop, n+1),
+            "\n{}op={}\n{}rop=".format(
+                tabs(n+1),
+                self.op.pretty(n+1),
+                tabs(n+1)
+            ),
+            (self.rop, n+1),
+            "\n{})".format(tabs(n))
+        ]
 
-    return out
+def prettyCommands(commands, n):
+    # Les commandes d'un bloc de niveau "n".
+    return prettyItems(commands, n+2, n+2)
 
 class FlatCallBase(CodeEntity):
     def __init__(self, pos, target, input, output):
@@ -174,29 +162,20 @@ class FlatCallBase(CodeEntity):
         self.input = input
         self.output = output
 
-    def pretty(self, n):
-        input = ""
-        output = ""
-
-        for v in self.input:
-            input += "\n{}{},".format(tabs(n+2), v.pretty(n+2))
-        for v in self.output:
-            output += "\n{}{},".format(tabs(n+2), v.pretty(n+2))
-
+    def prettyParts(self, n):
         return (
-            "{}(\n{}target={}\n{}input=[{}\n{}]," +
-            "\n{}output=[{}\n{}]\n{})"
-        ).format(
-            self.className,
-            tabs(n+1),
-            self.target,
-            tabs(n+1),
-            input,
-            tabs(n+1),
-            tabs(n+1),
-            output,
-            tabs(n+1),
-            tabs(n)
+            [
+                "{}(\n{}target={}\n{}input=[".format(
+                    self.className,
+                    tabs(n+1),
+                    self.target,
+                    tabs(n+1)
+                )
+            ] +
+            prettyItems(self.input, n+2, n+2) +
+            ["\n{}],\n{}output=[".format(tabs(n+1), tabs(n+1))] +
+            prettyItems(self.output, n+2, n+2) +
+            ["\n{}]\n{})".format(tabs(n+1), tabs(n))]
         )
 
 class FlatCall(FlatCallBase):
@@ -213,29 +192,17 @@ class TypedIf(CodeEntity):
         self.aIfTrue = aIfTrue
         self.aElse = aElse
 
-    def pretty(self, n):
-        aIfTrue = ""
-        aElse = ""
-
-        for c in self.aIfTrue:
-            aIfTrue += "\n{}{},".format(tabs(n+2), c.pretty(n+2))
-
-        for c in self.aElse:
-            aElse += "\n{}{},".format(tabs(n+2), c.pretty(n+2))
-
+    def prettyParts(self, n):
         return (
-            "TypedIf(\n{}cond={}," +
-            "\n{}aIfTrue=[{}\n{}],\n{}aElse=[{}\n{}]\n{})"
-        ).format(
-            tabs(n+1),
-            self.cond.pretty(n+1),
-            tabs(n+1),
-            aIfTrue,
-            tabs(n+1),
-            tabs(n+1),
-            aElse,
-            tabs(n+1),
-            tabs(n)
+            [
+                "TypedIf(\n{}cond=".format(tabs(n+1)),
+                (self.cond, n+1),
+                ",\n{}aIfTrue=[".format(tabs(n+1))
+            ] +
+            prettyCommands(self.aIfTrue, n) +
+            ["\n{}],\n{}aElse=[".format(tabs(n+1), tabs(n+1))] +
+            prettyCommands(self.aElse, n) +
+            ["\n{}]\n{})".format(tabs(n+1), tabs(n))]
         )
 
 class TypedLoop(CodeEntity):
@@ -244,21 +211,17 @@ class TypedLoop(CodeEntity):
         self.loopid = loopid
         self.commands = commands
 
-    def pretty(self, n):
-        commands = ""
-
-        for c in self.commands:
-            commands += "\n{}{},".format(tabs(n+2), c.pretty(n+2))
-
+    def prettyParts(self, n):
         return (
-            "TypedLoop(\n{}loopid={}\n{}commands=[{}\n{}]\n{})"
-        ).format(
-            tabs(n+1),
-            self.loopid,
-            tabs(n+1),
-            commands,
-            tabs(n+1),
-            tabs(n)
+            [
+                "TypedLoop(\n{}loopid={}\n{}commands=[".format(
+                    tabs(n+1),
+                    self.loopid,
+                    tabs(n+1)
+                )
+            ] +
+            prettyCommands(self.commands, n) +
+            ["\n{}]\n{})".format(tabs(n+1), tabs(n))]
         )
 
 class TypedBreak(CodeEntity):
@@ -266,8 +229,8 @@ class TypedBreak(CodeEntity):
         super().__init__(pos)
         self.loopid = loopid
 
-    def pretty(self, n):
-        return "TypedBreak(loopid={})".format(self.loopid)
+    def prettyParts(self, n):
+        return ["TypedBreak(loopid={})".format(self.loopid)]
 
 class TypedFunction(CodeEntity):
     def __init__(self, pos, type, name, vars, args, commands, value):
@@ -279,42 +242,22 @@ class TypedFunction(CodeEntity):
         self.commands = commands
         self.value = value
 
-    def pretty(self, n):
-        vars = ""
-        args = ""
-        commands = ""
-        value = ""
-
-        for v in self.vars:
-            vars += "\n{}{},".format(tabs(n+2), v.pretty(n+1))
-
-        for a in self.args:
-            args += "\n{}{},".format(tabs(n+2), a.pretty(n+1))
-
-        for c in self.commands:
-            commands += "\n{}{},".format(tabs(n+2), c.pretty(n+2))
-
-        for v in self.value:
-            value += "\n{}{}".format(tabs(n+2), v.pretty(n+2))
-
+    def prettyParts(self, n):
         return (
-            "TypedFunction(\n{}name=\"{}\"\n{}vars=[{}\n{}]," +
-            "\n{}args=[{}\n{}],\n{}commands=[{}\n{}]," +
-            "\n{}value=[{}\n{}]\n{})"
-        ).format(
-            tabs(n+1),
-            self.name,
-            tabs(n+1),
-            vars,
-            tabs(n+1),
-            tabs(n+1),
-            args,
-            tabs(n+1),
-            tabs(n+1),
-            commands,
-            tabs(n+1),
-            tabs(n+1),
-            value,
-            tabs(n+1),
-            tabs(n)
+            [
+                "TypedFunction(\n{}name=\"{}\"\n{}vars=[".format(
+                    tabs(n+1),
+                    self.name,
+                    tabs(n+1)
+                )
+            ] +
+            prettyItems(self.vars, n+2, n+1) +
+            ["\n{}],\n{}args=[".format(tabs(n+1), tabs(n+1))] +
+            prettyItems(self.args, n+2, n+1) +
+            ["\n{}],\n{}commands=[".format(tabs(n+1), tabs(n+1))] +
+            prettyCommands(self.commands, n) +
+            ["\n{}],\n{}value=[".format(tabs(n+1), tabs(n+1))] +
+            prettyItems(self.value, n+2, n+2, "") +
+            ["\n{}]\n{})".format(tabs(n+1), tabs(n))]
         )
+
@@ -5,12 +5,10 @@ from program_types import *
 from flatIR import *
 
 def assertTypeMatch(
-    ltype, rtype, lpos, rpos,
+    varstack, ltype, rtype, lpos, rpos,
     evaluateGenerics=False,
     genericMap=None
 ):
-    encounteredBoxes = []
-
     if evaluateGenerics and genericMap == None:
         # On a besoin de "genericMap" dans ce cas,
         # mais c'est une erreur dans le compilateur
@@ -18,6 +16,24 @@ def assertTypeMatch(
         # pas besoin de donner de beau message d'erreur.
         raise NotImplemented()
 
+    if ltype == rtype:
+        return
+
+    # Le résultat ne dépend que de la structure des types, sauf
+    # quand on évalue les types génériques de "ltype" : on les
+    # associe alors dans "genericMap".
+    typeIds = varstack.typeIds
+    key = (typeIds.typeId(ltype), typeIds.typeId(rtype))
+    memoize = not (
+        None in key or
+        (evaluateGenerics and key[0] in typeIds.generic)
+    )
+
+    if memoize and (key[0] == key[1] or key in varstack.matchedTypes):
+        return
+
+    encounteredBoxes = set()
+
     def internalMatcher(ltype, rtype, lpos, rpos):
         if ltype == None:
             return
@@ -63,7 +79,7 @@ def assertTypeMatch(
                         lwrapped = genericMap[ltype.genericName]
                     else:
                         genericMap[ltype.genericName] = rwrapped
-                        encounteredBoxes.append((ltype, rtype))
+                        encounteredBoxes.add((ltype, rtype))
                         return
                 elif not isinstance(ltype, BoxType):
                     raise FlattenError(
@@ -79,7 +95,7 @@ def assertTypeMatch(
 
                 if (ltype, rtype) in encounteredBoxes:
                     return
-                encounteredBoxes.append((ltype, rtype))
+                encounteredBoxes.add((ltype, rtype))
 
                 internalMatcher(
                     lwrapped, rwrapped, lpos, rpos
@@ -111,9 +127,12 @@ def assertTypeMatch(
 
     internalMatcher(ltype, rtype, lpos, rpos)
 
+    if memoize:
+        varstack.matchedTypes.add(key)
+
 def expandLValue(varstack, lvalue, rtype, rpos):
     assertTypeMatch(
-        lvalue.type, rtype,
+        varstack, lvalue.type, rtype,
         lvalue.pos(), rpos
     )
 
@@ -216,7 +235,7 @@ def flattenArith(varstack, arith):
         a, rvalue = flattenRValue(varstack, o)
         assignments.extend(a)
         assertTypeMatch(
-            operandType, rvalue.type, arith.pos(), rvalue.pos()
+            varstack, operandType, rvalue.type, arith.pos(), rvalue.pos()
         )
         operands[i] = rvalue
 
@@ -250,7 +269,7 @@ def flattenCmp(varstack, cmp):
             assignments.extend(a)
 
             assertTypeMatch(
-                Integer, val.type, cmp.pos(), val.pos()
+                varstack, Integer, val.type, cmp.pos(), val.pos()
             )
 
             if not isinstance(val, TypedVar):
@@ -370,6 +389,38 @@ def instantiateGenerics(rtype, genericMap):
             raise NotImplemented()
     return visitRType(rtype)
 
+def copyType(type, visited):
+    # Renvoie une copie de "type" (un type déjà instancié), aux mêmes
+    # positions.
+    if type in visited:
+        return visited[type]
+
+    if isinstance(type, TupleType):
+        return TupleType(
+            type.pos(), [copyType(c, visited) for c in type.contents]
+        )
+    elif isinstance(type, ListType):
+        # Le constructeur recrée le n-uplet qui pointe sur la liste.
+        typed = ListType(type.pos(), None)
+        visited[type] = typed
+        typed.contentType = copyType(type.contentType, visited)
+        typed.wrapped.contents[0] = typed.contentType
+        return typed
+    elif isinstance(type, BoxType):
+        typed = BoxType(type.pos(), None)
+        visited[type] = typed
+
+        if type.wrapped != None:
+            typed.wrapped = copyType(type.wrapped, visited)
+
+        if hasattr(type, "contentType"):
+            typed.contentType = copyType(type.contentType, visited)
+
+        return typed
+    else:
+        # Les types unitaires (et "None") ne sont jamais modifiés.
+        return type
+
 def flattenCall(varstack, call):
     if not isinstance(call.target, Var):
         raise NotImplemented()
@@ -396,19 +447,44 @@ def flattenCall(varstack, call):
         )
 
     genericMap = {}
+    values = []
+    signature = [ftype]
+    # Les arguments dont les types génériques sont dans "genericMap".
+    unified = 0
+
+    def unify(count):
+        # Unifie les arguments jusqu'au "count"-ième (exclu).
+        nonlocal unified
+
+        for i in range(unified, count):
+            assertTypeMatch(
+                varstack,
+                ftype.args[i],
+                values[i].type,
+                call.pos(),
+                call.args[i].pos(),
+                True,
+                genericMap
+            )
+
+        unified = max(unified, count)
 
     for i, arg in enumerate(call.args):
         a, val = flattenRValue(varstack, call.args[i])
         assignments.extend(a)
+        values.append(val)
+        signature.append(varstack.typeIds.typeId(val.type))
 
-        assertTypeMatch(
-            ftype.args[i],
-            val.type,
-            call.pos(),
-            call.args[i].pos(),
-            True,
-            genericMap
-        )
+        # Le résultat de l'unification ne dépend que de la structure
+        # des types : si ces premiers arguments ont déjà été acceptés,
+        # on n'unifie (pour remplir "genericMap") que si besoin.
+        key = tuple(signature)
+
+        if None in key or not key in varstack.checkedCalls:
+            unify(i + 1)
+
+            if not None in key:
+                varstack.checkedCalls.add(key)
 
         if isinstance(val.type, TupleType):
             args.extend(val.contents)
@@ -417,7 +493,29 @@ def flattenCall(varstack, call):
 
     if ftype.ret != Void:
         lvalue = varstack.createUnnamedVar(call.pos())
-        retType = instantiateGenerics(ftype.ret, genericMap)
+        key = tuple(signature)
+        retType = None
+
+        if not None in key:
+            retType = varstack.instantiatedReturns.get(key)
+
+        if retType != None:
+            # Chaque appel a son propre type de retour : on copie celui
+            # de la signature, sans refaire l'unification.
+            retType = copyType(retType, {})
+        else:
+            retId = varstack.typeIds.typeId(ftype.ret)
+
+            # Il ne faut "genericMap" que si le type de retour est
+            # générique.
+            if retId == None or retId in varstack.typeIds.generic:
+                unify(len(values))
+
+            retType = instantiateGenerics(ftype.ret, genericMap)
+
+            if not None in key:
+                varstack.instantiatedReturns[key] = retType
+
         lvalue = expandLValue(varstack, lvalue, retType, call.pos())
 
         if isinstance(lvalue.type, TupleType):
@@ -435,7 +533,9 @@ def flattenCall(varstack, call):
     else:
         return assignments, VoidValue(call.pos())
 
-def buildIfValue(varstack, pos, aIfTrue, aElse, valIfTrue, valElse):
+def buildIfValue(
+    varstack, pos, aIfTrue, aElse, valIfTrue, valElse, elseIf=False
+):
     # Retourne un triplet (value, aIfTrue, aElse)
     # où "value" est la variable qui contiendra l'éventuelle
     # valeur du "if".
@@ -449,6 +549,18 @@ def buildIfValue(varstack, pos, aIfTrue, aElse, valIfTrue, valElse):
 
     value = VoidValue(pos)
 
+    if (
+        elseIf and isinstance(valElse, TypedVar) and
+        valElse.virtualType == VirtualVarType.REAL and
+        isUnitType(valElse.type) and valIfTrue.type == valElse.type
+    ):
+        # Dans un "else if", "valElse" est la variable créée pour le
+        # "if" suivant : on la réutilise plutôt que de la recopier, pour
+        # que toute la chaîne n'affecte qu'une variable (voir
+        # "transpileIf").
+        aIfTrue.append(Assign(valIfTrue.pos(), valElse, valIfTrue))
+        return valElse, aIfTrue, aElse
+
     if valIfTrue.type != Void:
         value = varstack.createUnnamedVar(pos)
         value.type = valIfTrue.type
@@ -464,7 +576,7 @@ def buildIfValue(varstack, pos, aIfTrue, aElse, valIfTrue, valElse):
 def flattenIf(varstack, ifBlock):
     assignments, cond = flattenRValue(varstack, ifBlock.cond)
     assertTypeMatch(
-        Boolean, cond.type, ifBlock.pos(), cond.pos()
+        varstack, Boolean, cond.type, ifBlock.pos(), cond.pos()
     )
 
     aIfTrue, valIfTrue = flattenRValue(varstack, ifBlock.valIfTrue)
@@ -474,13 +586,15 @@ def flattenIf(varstack, ifBlock):
     if ifBlock.valElse != None:
         aElse, valElse = flattenRValue(varstack, ifBlock.valElse)
         assertTypeMatch(
-            valIfTrue.type, valElse.type, valIfTrue.pos(), valElse.pos()
+            varstack, valIfTrue.type, valElse.type,
+            valIfTrue.pos(), valElse.pos()
         )
 
     value, aIfTrue, aElse = buildIfValue(
         varstack, ifBlock.pos(),
         aIfTrue, aElse,
-        valIfTrue, valElse
+        valIfTrue, valElse,
+        isinstance(ifBlock.valElse, (IfBlock, IfUnwrapBlock))
     )
 
     assignments.append(
@@ -534,13 +648,15 @@ def flattenIfUnwrap(varstack, ifBlock):
     if ifBlock.valElse != None:
         aElse, valElse = flattenRValue(varstack, ifBlock.valElse)
         assertTypeMatch(
-            valIfTrue.type, valElse.type, valIfTrue.pos(), valElse.pos()
+            varstack, valIfTrue.type, valElse.type,
+            valIfTrue.pos(), valElse.pos()
         )
 
     value, aIfTrue, aElse = buildIfValue(
         varstack, ifBlock.pos(),
         aIfTrue, aElse,
-        valIfTrue, valElse
+        valIfTrue, valElse,
+        isinstance(ifBlock.valElse, (IfBlock, IfUnwrapBlock))
     )
 
     assignments.append(
@@ -612,7 +728,8 @@ def flattenCons(varstack, pos, element, list):
         )
 
     assertTypeMatch(
-        element.type, list.type.contentType, element.pos(), list.pos()
+        varstack, element.type, list.type.contentType,
+        element.pos(), list.pos()
     )
 
     if element.type == Void:
@@ -665,7 +782,7 @@ def flattenBreak(varstack, breakBlock):
         loopvar.setPos(rvalue.pos())
     else:
         assertTypeMatch(
-            loopvar.type, loopvar.pos(), rvalue.type, rvalue.pos()
+            varstack, loopvar.type, loopvar.pos(), rvalue.type, rvalue.pos()
         )
 
     if rvalue.type != Void:
@@ -871,7 +988,7 @@ def flattenFunction(varstack, type, value):
         functionValue = [blockValue]
 
     assertTypeMatch(
-        type.ret, blockValue.type,
+        varstack, type.ret, blockValue.type,
         type.pos(), blockValue.pos()
     )
 
@@ -0,0 +1,230 @@
+from functools import reduce
+
+from program_types import *
+from flatIR import *
+
+# Évaluation à la compilation des opérations dont les opérandes sont
+# constants. "propagateCopies" y fait appel après chaque substitution :
+# le résultat, s'il est constant, est propagé à son tour, et les "if"
+# dont la condition devient constante perdent leur autre branche.
+
+def isConstant(operand, type=None):
+    if not isinstance(operand, TypedConstant):
+        return False
+
+    return type == None or operand.type == type
+
+def constant(operand, type, val):
+    return TypedConstant(operand.pos(), type, val)
+
+def mayFail(operand):
+    # Une division par autre chose qu'une constante non nulle peut
+    # lever une exception : on ne la supprime pas.
+    stack = [operand]
+
+    while len(stack) != 0:
+        operand = stack.pop()
+
+        if isinstance(operand, Arith):
+            if operand.op == Operation.DIV:
+                for divisor in operand.operands[1:]:
+                    if not (
+                        isinstance(divisor, TypedConstant) and
+                        divisor.val != 0
+                    ):
+                        return True
+
+            stack.extend(operand.operands)
+        elif isinstance(operand, Unary):
+            stack.append(operand.target)
+        elif isinstance(operand, TypedCmp):
+            stack.append(operand.lop)
+            stack.append(operand.rop)
+        elif isinstance(operand, Tuple):
+            stack.extend(operand.contents)
+
+    return False
+
+def combine(operands, op, type, neutral):
+    # Regroupe les constantes de "operands" (pour une opération
+    # associative et commutative) en une seule, placée à la fin.
+    # Renvoie la nouvelle liste et le nombre de constantes regroupées.
+    constants = [o for o in operands if isConstant(o, type)]
+
+    if len(constants) < 2 and not (
+        len(constants) == 1 and constants[0].val == neutral
+    ):
+        return operands, 0
+
+    others = [o for o in operands if not isConstant(o, type)]
+    val = reduce(op, [c.val for c in constants])
+
+    if val != neutral or len(others) == 0:
+        others.append(constant(constants[0], type, val))
+        return others, len(constants) - 1
+
+    return others, len(constants)
+
+def concatConstants(operands):
+    # Les concaténations ne sont pas commutatives : on ne regroupe que
+    # les chaînes constantes voisines.
+    out = []
+    merged = 0
+
+    for o in operands:
+        if (
+            len(out) != 0 and isConstant(o, String) and
+            isConstant(out[-1], String)
+        ):
+            out[-1] = constant(out[-1], String, out[-1].val + o.val)
+            merged += 1
+        elif not (isConstant(o, String) and o.val == ""):
+            out.append(o)
+        else:
+            merged += 1
+
+    if len(out) == 0:
+        out.append(constant(operands[0], String, ""))
+
+    return out, merged
+
+def add(a, b):
+    return a + b
+
+def mul(a, b):
+    return a * b
+
+def foldArith(arith):
+    # Renvoie le couple (operand, folded) où "folded" est le nombre
+    # d'opérations évaluées.
+    operands = arith.operands
+    op = arith.op
+    folded = 0
+
+    if op == Operation.CONCAT:
+        operands, folded = concatConstants(operands)
+    elif op == Operation.ADD:
+        operands, folded = combine(operands, add, Integer, 0)
+    elif op == Operation.MUL:
+        operands, folded = combine(operands, mul, Integer, 1)
+    elif op == Operation.SUB:
+        # a - b - c = a - (b + c)
+        rest, folded = combine(operands[1:], add, Integer, 0)
+
+        if (
+            len(rest) == 1 and isConstant(operands[0], Integer) and
+            isConstant(rest[0], Integer)
+        ):
+            val = operands[0].val - rest[0].val
+            return constant(arith, Integer, val), folded + 1
+
+        if len(rest) == 0:
+            return operands[0], folded
+
+        operands = [operands[0]] + rest
+    elif op == Operation.DIV:
+        # La division par zéro doit rester une erreur à l'exécution.
+        if all(isConstant(o, Integer) for o in operands) and all(
+            o.val != 0 for o in operands[1:]
+        ):
+            val = reduce(lambda a, b: a // b, [o.val for o in operands])
+            return constant(arith, Integer, val), len(operands) - 1
+    elif op == Operation.AND or op == Operation.OR:
+        # "and" et "or" s'arrêtent à la première valeur décisive : on
+        # peut supprimer les opérandes neutres, et les suivants de la
+        # première constante décisive.
+        neutral = (op == Operation.AND)
+        out = []
+
+        for o in operands:
+            if isConstant(o, Boolean) and o.val == neutral:
+                folded += 1
+                continue
+
+            out.append(o)
+
+            if isConstant(o, Boolean):
+                folded += len(operands) - len(out)
+
+                # Les opérandes précédents n'ont pas d'effet de bord.
+                if not any(mayFail(p) for p in out):
+                    folded += len(out) - 1
+                    out = [o]
+
+                break
+
+        if len(out) == 0:
+            return constant(arith, Boolean, neutral), folded
+
+        if len(out) == 1 and isConstant(out[0], Boolean):
+            return out[0], folded
+
+        operands = out
+
+    if len(operands) == 1:
+        return operands[0], folded
+
+    if folded == 0:
+        return arith, 0
+
+    return TypedArith(arith.pos(), arith.type, op, operands), folded
+
+def compare(op, l, r):
+    if op == Comparison.LT:
+        return l < r
+    elif op == Comparison.LEQ:
+        return l <= r
+    elif op == Comparison.GT:
+        return l > r
+    elif op == Comparison.GEQ:
+        return l >= r
+    elif op == Comparison.EQ:
+        return l == r
+    else:
+        raise NotImplemented()
+
+def foldOperand(operand):
+    # Renvoie le couple (operand, folded), voir "foldArith".
+    # Les opérandes peuvent être partagés : on construit de nouveaux
+    # nœuds plutôt que de modifier ceux-ci.
+    if isinstance(operand, TypedArith):
+        operands = []
+        folded = 0
+
+        for o in operand.operands:
+            o, n = foldOperand(o)
+            operands.append(o)
+            folded += n
+
+        if any(a is not b for a, b in zip(operands, operand.operands)):
+            operand = TypedArith(
+                operand.pos(), operand.type, operand.op, operands
+            )
+
+        operand, n = foldArith(operand)
+        return operand, folded + n
+    elif isinstance(operand, TypedUnary):
+        target, folded = foldOperand(operand.target)
+
+        if operand.op == Operation.NOT and isConstant(target, Boolean):
+            return constant(operand, Boolean, not target.val), folded + 1
+
+        if target is not operand.target:
+            operand = TypedUnary(operand.pos(), None, operand.op, target)
+
+        return operand, folded
+    elif isinstance(operand, TypedCmp):
+        lop, lfolded = foldOperand(operand.lop)
+        rop, rfolded = foldOperand(operand.rop)
+        folded = lfolded + rfolded
+
+        if isConstant(lop, Integer) and isConstant(rop, Integer):
+            val = compare(operand.op, lop.val, rop.val)
+            return constant(operand, Boolean, val), folded + 1
+
+        if lop is not operand.lop or rop is not operand.rop:
+            operand = TypedCmp(operand.pos(), lop, operand.op, rop)
+
+        return operand, folded
+    else:
+        return operand, 0
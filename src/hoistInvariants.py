@@ -0,0 +1,155 @@
+from program_types import *
+from flatIR import *
+from allocateSlots import FlowGraph, operandVars
+from foldConstants import mayFail
+
+# Sortie des boucles des calculs invariants.
+#
+# Une affectation du corps d'une boucle (hors des "if" et des boucles
+# imbriquées) est faite une seule fois, juste avant la boucle, si :
+#  - elle n'a pas d'effet de bord et ne peut pas échouer (pas de
+#    division par autre chose qu'une constante non nulle) ;
+#  - aucune des variables qu'elle lit n'est affectée dans la boucle
+#    (sauf par une affectation déjà sortie) ;
+#  - c'est la seule affectation de sa variable dans la boucle ;
+#  - sa variable n'est vivante ni à l'entrée de la boucle (elle serait
+#    lue avant d'être affectée), ni à ses sorties (la boucle peut
+#    s'arrêter avant l'affectation).
+# La fonction native "full" est traitée comme une affectation. Les
+# appels des autres fonctions ne sont jamais sortis : on ne sait pas
+# s'ils ont des effets de bord.
+
+def countAssigns(commands, counts):
+    # Ajoute à "counts" (variable -> nombre) les affectations de
+    # "commands", et renvoie "counts".
+    for comm in commands:
+        if isinstance(comm, Assign):
+            counts[comm.l] = counts.get(comm.l, 0) + 1
+        elif isinstance(comm, FlatCallBase):
+            for var in comm.output:
+                counts[var] = counts.get(var, 0) + 1
+        elif isinstance(comm, TypedIf):
+            countAssigns(comm.aIfTrue, counts)
+            countAssigns(comm.aElse, counts)
+        elif isinstance(comm, TypedLoop):
+            countAssigns(comm.commands, counts)
+
+    return counts
+
+def breaks(commands, out):
+    # Ajoute à "out" les "break" de "commands", et renvoie "out".
+    for comm in commands:
+        if isinstance(comm, TypedBreak):
+            out.append(comm)
+        elif isinstance(comm, TypedIf):
+            breaks(comm.aIfTrue, out)
+            breaks(comm.aElse, out)
+        elif isinstance(comm, TypedLoop):
+            breaks(comm.commands, out)
+
+    return out
+
+def invariantParts(comm):
+    # Renvoie le couple (defs, uses) des variables écrites et lues par
+    # "comm" si l'on peut la sortir d'une boucle (selon ses opérandes),
+    # None sinon.
+    if isinstance(comm, Assign):
+        if mayFail(comm.r):
+            return None
+
+        return [comm.l], operandVars([comm.r])
+    elif isinstance(comm, NativeCall) and comm.target == "full":
+        return comm.output, operandVars(comm.input)
+    else:
+        return None
+
+class Hoister:
+    def __init__(self, function):
+        graph = FlowGraph()
+        graph.add([], function.args)
+        graph.addCommands(function.commands)
+        graph.add(operandVars(function.value), [])
+        self.liveOut = graph.liveOut()
+        self.nodes = {}
+
+        for node, comm in enumerate(graph.commands):
+            if comm != None:
+                self.nodes[id(comm)] = node
+
+        # Les commandes déjà sorties d'une boucle : la vivacité calculée
+        # ne vaut plus pour elles.
+        self.moved = set()
+        self.count = 0
+
+    def hoistInLoop(self, loop):
+        # Renvoie la liste des commandes sorties du corps de "loop".
+        counts = countAssigns(loop.commands, {})
+        assigned = set(counts)
+        # Variables qu'il ne faut pas affecter avant la boucle.
+        live = self.liveOut[self.nodes[id(loop)]]
+
+        for comm in breaks(loop.commands, []):
+            live |= self.liveOut[self.nodes[id(comm)]]
+
+        hoisted = []
+        kept = []
+
+        for comm in loop.commands:
+            parts = None
+
+            if not id(comm) in self.moved:
+                parts = invariantParts(comm)
+
+            if parts != None:
+                (defs, uses) = parts
+
+                if not all(
+                    var.virtualType == VirtualVarType.REAL and
+                    var.id >= 0 and counts[var] == 1 and
+                    live & (1 << var.id) == 0
+                    for var in defs
+                ) or any(var in assigned for var in uses):
+                    parts = None
+
+            if parts == None:
+                kept.append(comm)
+                continue
+
+            hoisted.append(comm)
+            self.moved.add(id(comm))
+            assigned.difference_update(parts[0])
+
+        loop.commands = kept
+        self.count += len(hoisted)
+        return hoisted
+
+    def hoistInCommands(self, commands):
+        out = []
+
+        for comm in commands:
+            if isinstance(comm, TypedIf):
+                comm.aIfTrue = self.hoistInCommands(comm.aIfTrue)
+                comm.aElse = self.hoistInCommands(comm.aElse)
+            elif isinstance(comm, TypedLoop):
+                # Les boucles imbriquées d'abord : ce qui en sort peut
+                # encore sortir de celle-ci, à la passe suivante.
+                comm.commands = self.hoistInCommands(comm.commands)
+                out.extend(self.hoistInLoop(comm))
+
+            out.append(comm)
+
+        return out
+
+def hoistInvariants(function):
+    # Renvoie le nombre de commandes sorties des boucles. On recommence
+    # tant qu'on en sort : la vivacité a changé.
+    count = 0
+
+    while True:
+        hoister = Hoister(function)
+        function.commands = hoister.hoistInCommands(function.commands)
+
+        if hoister.count == 0:
+            return count
+
+        count += hoister.count
@@ -0,0 +1,277 @@
+from program_types import *
+from AST import Call, Var
+from flatIR import *
+
+# Recopie du corps des petites fonctions à la place de leurs appels.
+#
+# Un appel "FlatCall" coûte un appel de fonction Python à chaque
+# exécution. Quand la fonction appelée est petite (voir "Inliner" dans
+# "compileProgram"), on le remplace par une copie de son IR, où les
+# variables et les boucles sont renumérotées : les arguments sont
+# d'abord copiés dans les paramètres, puis la valeur de la fonction
+# dans les variables de sortie de l'appel.
+#
+# Une fonction récursive (directement ou non) n'est jamais recopiée :
+# la copie ne s'arrêterait pas.
+
+# Classe d'un nœud de l'AST -> attributs qui peuvent contenir d'autres
+# nœuds (voir "calledFunctions").
+childSlots = {}
+
+def calledFunctions(ast):
+    # Renvoie l'ensemble des noms des fonctions appelées par "ast".
+    names = set()
+    stack = [ast.body]
+
+    while len(stack) != 0:
+        node = stack.pop()
+
+        if isinstance(node, (list, tuple)):
+            stack.extend(node)
+            continue
+
+        if not isinstance(node, CodeEntity):
+            continue
+
+        if isinstance(node, Call) and isinstance(node.target, Var):
+            names.add(node.target.name)
+
+        slots = childSlots.get(type(node))
+
+        if slots == None:
+            slots = tuple(
+                slot for cls in type(node).__mro__
+                for slot in getattr(cls, "__slots__", ())
+                if slot != "_pos"
+            )
+            childSlots[type(node)] = slots
+
+        for slot in slots:
+            stack.append(getattr(node, slot, None))
+
+    return names
+
+def recursiveFunctions(graph):
+    # Renvoie l'ensemble des fonctions de "graph" (nom -> ensemble des
+    # noms appelés) qui font partie d'un cycle : les composantes
+    # fortement connexes de plus d'une fonction, et les fonctions qui
+    # s'appellent elles-mêmes (algorithme de Tarjan, avec une pile
+    # explicite).
+    index = {}
+    low = {}
+    stack = []
+    onStack = set()
+    recursive = set()
+
+    for root in graph:
+        if root in index:
+            continue
+
+        work = [(root, iter(graph[root]))]
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        onStack.add(root)
+
+        while len(work) != 0:
+            (name, callees) = work[-1]
+            callee = next(callees, None)
+
+            if callee != None:
+                if not callee in graph:
+                    continue
+
+                if not callee in index:
+                    index[callee] = low[callee] = len(index)
+                    stack.append(callee)
+                    onStack.add(callee)
+                    work.append((callee, iter(graph[callee])))
+                elif callee in onStack:
+                    low[name] = min(low[name], index[callee])
+
+                continue
+
+            work.pop()
+
+            if len(work) != 0:
+                caller = work[-1][0]
+                low[caller] = min(low[caller], low[name])
+
+            if low[name] != index[name]:
+                continue
+
+            component = []
+
+            while True:
+                member = stack.pop()
+                onStack.discard(member)
+                component.append(member)
+
+                if member == name:
+                    break
+
+            if len(component) > 1 or name in graph[name]:
+                recursive.update(component)
+
+    return recursive
+
+def maxLoopId(commands):
+    loopid = -1
+
+    for comm in commands:
+        if isinstance(comm, (TypedLoop, TypedBreak)):
+            loopid = max(loopid, comm.loopid)
+
+        if isinstance(comm, TypedIf):
+            loopid = max(loopid, maxLoopId(comm.aIfTrue))
+            loopid = max(loopid, maxLoopId(comm.aElse))
+        elif isinstance(comm, TypedLoop):
+            loopid = max(loopid, maxLoopId(comm.commands))
+
+    return loopid
+
+class Splicer:
+    # Recopie des fonctions dans "function", avec des variables et des
+    # boucles qui n'y sont pas encore utilisées.
+    def __init__(self, function):
+        self.function = function
+        self.nextId = 1 + max([var.id for var in function.vars], default=-1)
+        self.nextLoopId = 1 + maxLoopId(function.commands)
+
+    def copyVar(self, var, vars):
+        copy = vars.get(var)
+
+        if copy != None:
+            return copy
+
+        copy = TypedVar(var.pos(), var.type, None)
+
+        if var.virtualType != VirtualVarType.REAL:
+            copy.markVirtual(
+                var.virtualType,
+                [self.copyOperand(o, vars) for o in var.virtualContents]
+            )
+        else:
+            copy.setId(self.nextId)
+            self.nextId += 1
+            self.function.vars.append(copy)
+
+        vars[var] = copy
+        return copy
+
+    def copyOperand(self, operand, vars):
+        if isinstance(operand, TypedVar):
+            return self.copyVar(operand, vars)
+        elif isinstance(operand, TypedArith):
+            return TypedArith(
+                operand.pos(), operand.type, operand.op,
+                [self.copyOperand(o, vars) for o in operand.operands]
+            )
+        elif isinstance(operand, TypedUnary):
+            return TypedUnary(
+                operand.pos(), None, operand.op,
+                self.copyOperand(operand.target, vars)
+            )
+        elif isinstance(operand, TypedCmp):
+            return TypedCmp(
+                operand.pos(),
+                self.copyOperand(operand.lop, vars),
+                operand.op,
+                self.copyOperand(operand.rop, vars)
+            )
+        elif isinstance(operand, TypedTuple):
+            return TypedTuple(
+                operand.pos(), operand.type,
+                [self.copyOperand(o, vars) for o in operand.contents]
+            )
+        else:
+            # Les constantes ne sont jamais modifiées.
+            return operand
+
+    def copyCommands(self, commands, vars, offset):
+        out = []
+
+        for comm in commands:
+            if isinstance(comm, Assign):
+                r = self.copyOperand(comm.r, vars)
+                out.append(
+                    Assign(comm.pos(), self.copyVar(comm.l, vars), r)
+                )
+            elif isinstance(comm, FlatCallBase):
+                out.append(type(comm)(
+                    comm.pos(), comm.target,
+                    [self.copyOperand(o, vars) for o in comm.input],
+                    [self.copyVar(o, vars) for o in comm.output]
+                ))
+            elif isinstance(comm, TypedIf):
+                out.append(TypedIf(
+                    comm.pos(),
+                    self.copyOperand(comm.cond, vars),
+                    self.copyCommands(comm.aIfTrue, vars, offset),
+                    self.copyCommands(comm.aElse, vars, offset)
+                ))
+            elif isinstance(comm, TypedLoop):
+                out.append(TypedLoop(
+                    comm.pos(), comm.loopid + offset,
+                    self.copyCommands(comm.commands, vars, offset)
+                ))
+            elif isinstance(comm, TypedBreak):
+                out.append(TypedBreak(comm.pos(), comm.loopid + offset))
+            else:
+                out.append(self.copyOperand(comm, vars))
+
+        return out
+
+    def splice(self, call, callee):
+        # Renvoie les commandes qui remplacent l'appel "call" à la
+        # fonction "callee" (un "TypedFunction" qui n'est pas modifié).
+        vars = {}
+        offset = self.nextLoopId
+        self.nextLoopId += 1 + maxLoopId(callee.commands)
+        commands = []
+
+        for arg, operand in zip(callee.args, call.input):
+            commands.append(
+                Assign(call.pos(), self.copyVar(arg, vars), operand)
+            )
+
+        commands.extend(self.copyCommands(callee.commands, vars, offset))
+
+        for out, operand in zip(call.output, callee.value):
+            commands.append(
+                Assign(call.pos(), out, self.copyOperand(operand, vars))
+            )
+
+        return commands
+
+def canSplice(call, callee):
+    # Les arguments et la valeur d'une fonction peuvent être des
+    # n-uplets : on ne recopie que les fonctions dont les paramètres et
+    # la valeur correspondent un à un aux opérandes de l'appel.
+    return (
+        len(callee.args) == len(call.input) and
+        len(callee.value) == len(call.output) and
+        all(
+            arg.virtualType == VirtualVarType.REAL
+            for arg in callee.args
+        )
+    )
+
+def copyFunction(function):
+    # Renvoie une copie de "function", où les variables gardent leurs
+    # numéros.
+    vars = {}
+
+    for var in function.vars:
+        copy = TypedVar(var.pos(), var.type, None)
+        copy.setId(var.id)
+        vars[var] = copy
+
+    copy = TypedFunction(
+        function.pos(), function.type, function.name,
+        list(vars.values()), [], [], []
+    )
+    splicer = Splicer(copy)
+    copy.args = [splicer.copyVar(arg, vars) for arg in function.args]
+    copy.commands = splicer.copyCommands(function.commands, vars, 0)
+    copy.value = [splicer.copyOperand(o, vars) for o in function.value]
+    return copy
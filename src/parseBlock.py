@@ -6,6 +6,9 @@ from parse_util import *
 # Dépendances circulaires...
 import parseLRValue
 
+# Comme dans "parseLRValue", "parseCommand" et "parseBlock" sont des
+# générateurs, exécutés par "runParser".
+
 def parseCommand(tokenizer):
     # Renvoie un couple (isRValue, val).
 
@@ -15,7 +18,7 @@ def parseCommand(tokenizer):
     if peek.isKeyword(Keyword.LET):
         tokenizer.nextToken()
 
-        isLValuable, lvalue = parseLRValue.parseLRValue(tokenizer)
+        isLValuable, lvalue = yield parseLRValue.parseLRValue(tokenizer)
 
         if not isLValuable:
             raise ASTError(lvalue.pos(), "Expected a lvalue.")
@@ -23,7 +26,7 @@ def parseCommand(tokenizer):
         eq = tokenizer.current()
         expectSymbol(eq, Symbol.EQ)
 
-        _, rvalue = parseLRValue.parseLRValue(tokenizer)
+        _, rvalue = yield parseLRValue.parseLRValue(tokenizer)
 
         if rvalue == None:
             raise ASTError(
@@ -40,12 +43,12 @@ def parseCommand(tokenizer):
     elif peek.isKeyword(Keyword.RETURN):
         raise NotImplemented()
         tokenizer.nextToken()
-        _, val = parseLRValue.parseLRValue(tokenizer)
+        _, val = yield parseLRValue.parseLRValue(tokenizer)
         return False, Return((start, val.pos()[1]), val)
     elif peek.isKeyword(Keyword.BREAK):
         token = tokenizer.nextToken()
         expectKeyword(token, Keyword.BREAK)
-        _, val = parseLRValue.parseLRValue(tokenizer)
+        _, val = yield parseLRValue.parseLRValue(tokenizer)
         start, end = token.pos()
 
         if val != None:
@@ -53,7 +56,7 @@ def parseCommand(tokenizer):
 
         return False, Break((start, end), val)
     else:
-        isLValuable, val = parseLRValue.parseLRValue(tokenizer)
+        isLValuable, val = yield parseLRValue.parseLRValue(tokenizer)
 
         if tokenizer.current().isSymbol(Symbol.EQ):
             if not isLValuable:
@@ -62,7 +65,7 @@ def parseCommand(tokenizer):
                     "Expected a LValue for assignment."
                 )
 
-            _, rvalue = parseLRValue.parseLRValue(tokenizer)
+            _, rvalue = yield parseLRValue.parseLRValue(tokenizer)
 
             if rvalue == None:
                 raise ASTError(
@@ -98,7 +101,7 @@ def parseBlock(tokenizer):
             expectSymbol(tokenizer.current(), Symbol.SEMICOLON)
         firstCommand = False
 
-        isRValue, command = parseCommand(tokenizer)
+        isRValue, command = yield from parseCommand(tokenizer)
 
         if tokenizer.current().isSymbol(Symbol.RBRACKET):
             break
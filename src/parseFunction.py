@@ -168,7 +168,7 @@ def parseFunction(tokenizer):
     typePos, argTypes, args, retType = parseFnArgs(tokenizer)
     type = FunctionType(typePos, argTypes, retType)
 
-    body = parseBlock.parseBlock(tokenizer)
+    body = runParser(parseBlock.parseBlock(tokenizer))
     end = body.pos()[1]
 
     return Function((start, end), name, type, args, body)
@@ -1,13 +1,24 @@
 
 from AST import *
 from Tokens import *
-from PrecedenceBuilder import PrecedenceBuilder
+from PrecedenceBuilder import PrecedenceBuilder, operators
 from parse_util import *
 
 # Dépendances circulaires...
 import parseFunction
 import parseBlock
 
+# Les fonctions d'analyse qui peuvent s'imbriquer sont des générateurs,
+# exécutés par "runParser" (voir "parse_util").
+
+comparisons = {
+    Symbol.LT: Comparison.LT,
+    Symbol.LEQ: Comparison.LEQ,
+    Symbol.GT: Comparison.GT,
+    Symbol.GEQ: Comparison.GEQ,
+    Symbol.EQ: Comparison.EQ
+}
+
 def parseArgs(tokenizer):
     # Renvoie un triplet (pos, isLValuable, args).
 
@@ -46,7 +57,7 @@ def parseArgs(tokenizer):
         cmps.append((op, pos))
 
     while True:
-        argLValuable, arg = parseLRValue(tokenizer)
+        argLValuable, arg = yield parseLRValue(tokenizer)
         isLValuable = isLValuable and argLValuable
         token = tokenizer.current()
         end = token.pos()[1]
@@ -59,20 +70,12 @@ def parseArgs(tokenizer):
                 )
             args.append(arg)
 
-        cmp_dict = {
-            Symbol.LT: Comparison.LT,
-            Symbol.LEQ: Comparison.LEQ,
-            Symbol.GT: Comparison.GT,
-            Symbol.GEQ: Comparison.GEQ,
-            Symbol.EQ: Comparison.EQ
-        }
-
         if token.isSymbol(Symbol.COMMA):
             expectArg(token.pos())
-        elif token.getValue() in cmp_dict:
+        elif token.getValue() in comparisons:
             isLValuable = False
             expectArg(token.pos())
-            receiveComparator(token.pos(), cmp_dict[token.getValue()])
+            receiveComparator(token.pos(), comparisons[token.getValue()])
         elif token.isSymbol(Symbol.RPAR):
             if arg != None:
                 args.append(arg)
@@ -142,7 +145,7 @@ def parseMaybeArith(tokenizer):
             target = Constant(token.pos(), String, token.getValue())
             isLValuable = False
         elif token.isSymbol(Symbol.LPAR):
-            pos, argsLValuable, contents = parseArgs(tokenizer)
+            pos, argsLValuable, contents = yield from parseArgs(tokenizer)
             isLValuable = isLValuable and argsLValuable
             expectSymbol(tokenizer.current(), Symbol.RPAR)
 
@@ -165,7 +168,7 @@ def parseMaybeArith(tokenizer):
         token = tokenizer.nextToken()
 
         if token.isSymbol(Symbol.LPAR):
-            pos, argsLValuable, args = parseArgs(tokenizer)
+            pos, argsLValuable, args = yield from parseArgs(tokenizer)
             isLValuable = isLValuable and argsLValuable
             expectSymbol(tokenizer.current(), Symbol.RPAR)
             tokenizer.nextToken()
@@ -181,23 +184,13 @@ def parseMaybeArith(tokenizer):
 
         token = tokenizer.current()
 
-        if token.isSymbol(Symbol.CONCAT):
-            builder.receiveOperator(Operation.CONCAT)
-        elif token.isSymbol(Symbol.OR):
-            builder.receiveOperator(Operation.OR)
-        elif token.isSymbol(Symbol.AND):
-            builder.receiveOperator(Operation.AND)
-        elif token.isSymbol(Symbol.ADD):
-            builder.receiveOperator(Operation.ADD)
-        elif token.isSymbol(Symbol.MUL):
-            builder.receiveOperator(Operation.MUL)
-        elif token.isSymbol(Symbol.SUB):
-            builder.receiveOperator(Operation.SUB)
-        elif token.isSymbol(Symbol.DIV):
-            builder.receiveOperator(Operation.DIV)
-        else:
+        operator = operators.get(token.getValue())
+
+        if operator == None:
             return finalize(start, end)
 
+        builder.receiveOperator(operator)
+
         expectOperand = True
         needOperand = True
 
@@ -205,7 +198,7 @@ def parseMaybeArith(tokenizer):
         val = None
 
         if expectOperand:
-            val = parseOperand()
+            val = yield from parseOperand()
         else:
             val = parseOperator()
 
@@ -224,7 +217,7 @@ def parseIf(tokenizer):
 
     token = tokenizer.current()
     # "cond" représente "box" dans le cas d'un "if unwrap".
-    _, cond = parseLRValue(tokenizer)
+    _, cond = yield parseLRValue(tokenizer)
     target = None
 
     if isUnwrapping:
@@ -236,7 +229,7 @@ def parseIf(tokenizer):
 
         onToken = tokenizer.current()
         expectKeyword(onToken, Keyword.ON)
-        isLValuable, target = parseLRValue(tokenizer)
+        isLValuable, target = yield parseLRValue(tokenizer)
 
         if target == None:
             raise ASTError(
@@ -257,7 +250,7 @@ def parseIf(tokenizer):
 
     thenToken = tokenizer.current()
     expectKeyword(thenToken, Keyword.THEN)
-    _, valIfTrue = parseLRValue(tokenizer)
+    _, valIfTrue = yield parseLRValue(tokenizer)
 
     if valIfTrue == None:
         raise ASTError(
@@ -270,7 +263,7 @@ def parseIf(tokenizer):
     maybeElse = tokenizer.current()
 
     if maybeElse.isKeyword(Keyword.ELSE):
-        _, valElse = parseLRValue(tokenizer)
+        _, valElse = yield parseLRValue(tokenizer)
 
         if valElse == None:
             raise ASTError(
@@ -291,7 +284,7 @@ def parseLoop(tokenizer):
     first = tokenizer.nextToken()
     start = first.pos()[0]
     expectKeyword(first, Keyword.LOOP)
-    body = parseBlock.parseBlock(tokenizer)
+    body = yield from parseBlock.parseBlock(tokenizer)
     end = body.pos()[1]
     tokenizer.nextToken()
 
@@ -315,7 +308,7 @@ def parseWrap(tokenizer):
         tokenizer.nextToken()
         return WrapEmpty((start, end), type)
     else:
-        _, target = parseLRValue(tokenizer)
+        _, target = yield parseLRValue(tokenizer)
         end = tokenizer.current().pos()[1]
         return Wrap((start, end), target)
 
@@ -330,9 +323,9 @@ def parseCons(tokenizer):
         tokenizer.nextToken()
         return ConsEmpty((start, end), type)
     else:
-        _, element = parseLRValue(tokenizer)
+        _, element = yield parseLRValue(tokenizer)
         expectSymbol(tokenizer.current(), Symbol.COMMA)
-        _, list = parseLRValue(tokenizer)
+        _, list = yield parseLRValue(tokenizer)
         end = tokenizer.current().pos()[1]
         return Cons((start, end), element, list)
 
@@ -342,16 +335,16 @@ def parseLRValue(tokenizer):
     peek = tokenizer.lookahead()
 
     if peek.isSymbol(Symbol.LBRACKET):
-        value = parseBlock.parseBlock(tokenizer)
+        value = yield from parseBlock.parseBlock(tokenizer)
         tokenizer.nextToken()
         return False, value
     elif peek.isKeyword(Keyword.IF):
-        return False, parseIf(tokenizer)
+        return False, (yield from parseIf(tokenizer))
     elif peek.isKeyword(Keyword.LOOP):
-        return False, parseLoop(tokenizer)
+        return False, (yield from parseLoop(tokenizer))
     elif peek.isKeyword(Keyword.WRAP):
-        return False, parseWrap(tokenizer)
+        return False, (yield from parseWrap(tokenizer))
     elif peek.isKeyword(Keyword.CONS):
-        return False, parseCons(tokenizer)
+        return False, (yield from parseCons(tokenizer))
     else:
-        return parseMaybeArith(tokenizer)
+        return (yield from parseMaybeArith(tokenizer))
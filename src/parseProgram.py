@@ -0,0 +1,211 @@
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from AST import ASTError
+from Tokenizer import Tokenizer, TokenizerError
+from parseFunction import parseFunction
+
+# En dehors des chaînes de caractères, on ne s'intéresse qu'aux blocs,
+# aux débuts de chaînes, aux commentaires et aux mots "fn".
+outsideString = re.compile(r'[{}"#]|(?<!\w)fn(?![\w#])')
+insideString = re.compile(r'["#\\]')
+
+def skipString(code, i):
+    # "i" est l'indice qui suit le '"' ouvrant.
+    # Renvoie un couple (end, newlines) où "end" est l'indice qui suit
+    # la chaîne, et "newlines" le nombre de retours à la ligne qu'elle
+    # contient et que le tokenizer ne compte pas (ceux qui terminent un
+    # commentaire, même dans une chaîne, sont comptés).
+    newlines = 0
+
+    while True:
+        match = insideString.search(code, i)
+
+        if match == None:
+            return len(code), newlines + code.count('\n', i)
+
+        k = match.start()
+        newlines += code.count('\n', i, k)
+        char = code[k]
+
+        if char == '"':
+            return k + 1, newlines
+        elif char == '\\':
+            newlines += code.count('\n', k + 1, k + 2)
+            i = k + 2
+        else:
+            end = code.find('\n', k)
+
+            if end == -1:
+                return len(code), newlines
+
+            i = end + 1
+
+def splitFunctions(code):
+    # Découpe "code" avant chaque "fn" qui n'est ni dans un bloc, ni
+    # dans une chaîne, ni dans un commentaire. Renvoie une liste de
+    # couples (fragment, start), où "start" est le triplet attendu
+    # par "Tokenizer" pour situer le fragment dans "code".
+    # Un découpage malheureux n'est pas grave : l'analyse du fragment
+    # échouera, et "parseProgram" renverra None.
+    starts = [(0, 1, 0)]
+    depth = 0
+    i = 0
+    # Nombre de retours à la ligne comptés par le tokenizer avant "i".
+    line = 1
+    lineCountedUpTo = 0
+    # Retours à la ligne des chaînes, que le tokenizer ne compte pas.
+    ignoredNewlines = 0
+    lastString = (0, 0)
+    # Un commentaire peut coller deux mots : "a#...\nfn" donne "afn".
+    commentEnd = -1
+    beforeComment = ""
+
+    while True:
+        match = outsideString.search(code, i)
+
+        if match == None:
+            break
+
+        k = match.start()
+        char = code[k]
+
+        if char == '#':
+            end = code.find('\n', k)
+
+            if end == -1:
+                break
+            if k != commentEnd:
+                beforeComment = code[k-1:k]
+
+            commentEnd = end + 1
+            i = end + 1
+        elif char == '{':
+            depth += 1
+            i = k + 1
+        elif char == '}':
+            depth -= 1
+            i = k + 1
+        elif char == '"':
+            i, newlines = skipString(code, k + 1)
+            ignoredNewlines += newlines
+            lastString = (k, i)
+        else:
+            i = k + 2
+
+            if depth != 0:
+                continue
+            if k == commentEnd and re.match(r'\w', beforeComment):
+                continue
+
+            lineOffset = code.rfind('\n', 0, k) + 1
+
+            if lastString[0] < lineOffset <= lastString[1]:
+                # Le dernier retour à la ligne est (peut-être) dans une
+                # chaîne : on ne découpe pas ici.
+                continue
+
+            line += code.count('\n', lineCountedUpTo, k) - ignoredNewlines
+            lineCountedUpTo = k
+            ignoredNewlines = 0
+
+            if k != 0:
+                starts.append((k, line, lineOffset))
+
+    chunks = []
+
+    for n, start in enumerate(starts):
+        end = len(code)
+
+        if n + 1 < len(starts):
+            end = starts[n + 1][0]
+
+        chunks.append((code[start[0]:end], start))
+
+    return chunks
+
+def parseChunk(chunk):
+    # Renvoie la liste des fonctions du fragment, ou None si son
+    # analyse a échoué (l'exception n'est pas renvoyée telle quelle :
+    # "ASTError" et "TokenizerError" ne survivent pas à un "pickle").
+    (code, start) = chunk
+
+    try:
+        tokenizer = Tokenizer(code, False, start)
+        functions = []
+
+        while not tokenizer.lookahead().isEOF():
+            functions.append(parseFunction(tokenizer))
+            tokenizer.forgetParsed()
+
+        return functions
+    except (TokenizerError, ASTError):
+        return None
+
+def parseChunks(chunks, jobs):
+    # Renvoie la liste des résultats de "parseChunk" sur "chunks", dans
+    # "jobs" processus si possible, ou None si le pool est inutilisable.
+    if jobs <= 1 or len(chunks) <= 1:
+        return [parseChunk(chunk) for chunk in chunks]
+
+    try:
+        context = multiprocessing.get_context("fork")
+    except ValueError:
+        return None
+
+    chunksize = max(1, len(chunks) // (4 * jobs))
+
+    try:
+        with ProcessPoolExecutor(jobs, mp_context=context) as pool:
+            return list(pool.map(parseChunk, chunks, chunksize=chunksize))
+    except (OSError, BrokenProcessPool):
+        return None
+
+def parseProgram(code, jobs=1, cache=None):
+    # Analyse les fonctions de "code" fragment par fragment : dans
+    # "jobs" processus, et en relisant celles qui sont dans "cache"
+    # (un "ASTCache") plutôt que de les analyser à nouveau.
+    # Renvoie la liste des couples (function, source) dans l'ordre du
+    # code source, où "source" est la clé du code généré pour la
+    # fonction dans "cache" (None sans cache). Renvoie None si ce n'est
+    # pas possible : il faut alors tout analyser séquentiellement, pour
+    # obtenir exactement la même erreur.
+    chunks = splitFunctions(code)
+    results = [None] * len(chunks)
+    keys = None
+    missing = list(range(len(chunks)))
+
+    if cache != None:
+        keys = [cache.key(chunk) for chunk in chunks]
+        results = cache.loadAll(keys)
+        missing = [n for n in missing if results[n] == None]
+
+    parsed = parseChunks([chunks[n] for n in missing], jobs)
+
+    if parsed == None:
+        return None
+
+    for n, functions in zip(missing, parsed):
+        if functions == None:
+            return None
+
+        results[n] = functions
+
+    if cache != None:
+        cache.storeAll([(keys[n], results[n]) for n in missing])
+        cache.evict()
+
+    parsed = []
+
+    for n, functions in enumerate(results):
+        for index, function in enumerate(functions):
+            source = None
+
+            if cache != None:
+                source = cache.sourceKey(chunks[n], index)
+
+            parsed.append((function, source))
+
+    return parsed
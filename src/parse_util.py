@@ -21,3 +21,33 @@ def expectIdentifier(token):
         raise ASTError(token.pos(), "Expected an identifier.")
 
     return token.getValue()
+
+def runParser(parser):
+    # Les fonctions d'analyse qui peuvent s'imbriquer (blocs, "if",
+    # expressions...) sont des générateurs : au lieu d'appeler une autre
+    # fonction d'analyse, elles produisent ("yield") le générateur
+    # correspondant, et reçoivent son résultat en retour.
+    # On les exécute ici avec une pile explicite : la profondeur
+    # d'imbrication du code analysé n'est donc pas limitée par la pile
+    # d'appels de Python.
+    # Seuls les appels à "parseLRValue", par lesquels passe toute
+    # imbrication, sont empilés ainsi ; les autres appels délèguent
+    # avec "yield from", sur une profondeur bornée.
+    stack = [parser]
+    push = stack.append
+    value = None
+
+    while True:
+        try:
+            value = stack[-1].send(value)
+        except StopIteration as stop:
+            stack.pop()
+            value = stop.value
+
+            if len(stack) == 0:
+                return value
+
+            continue
+
+        push(value)
+        value = None
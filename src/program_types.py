@@ -6,12 +6,44 @@ class NotImplemented(BaseException):
         self.args = ["Not implemented."]
 
 class CodeEntity:
+    # Les nœuds de l'AST sont très nombreux : ils n'ont pas de
+    # "__dict__", seulement les attributs déclarés dans "__slots__".
+    __slots__ = ("_pos",)
+
     def __init__(self, pos):
         self._pos = pos
 
     def pos(self):
         return self._pos
 
+    def pretty(self, n):
+        return "".join(prettyFragments(self, n))
+
+def prettyFragments(entity, n):
+    # Les sous-classes décrivent leur affichage par "prettyParts(n)" :
+    # une liste de chaînes et de couples (entity, n) à afficher à leur
+    # place. On les déroule ici avec une pile explicite et on ne
+    # concatène qu'une fois, pour un temps linéaire en la taille de
+    # l'affichage, quelle que soit la profondeur de l'arbre.
+    fragments = []
+    stack = [(entity, n)]
+
+    while len(stack) != 0:
+        item = stack.pop()
+
+        if isinstance(item, str):
+            fragments.append(item)
+            continue
+
+        (entity, n) = item
+
+        if isinstance(entity, CodeEntity):
+            stack.extend(reversed(entity.prettyParts(n)))
+        else:
+            fragments.append(entity.pretty(n))
+
+    return fragments
+
 class Operation(Enum):
     NOT = auto()
 
@@ -39,11 +71,22 @@ class Comparison(Enum):
         return self.name
 
 class Type():
+    __slots__ = ()
+
     def type_repr():
         raise NotImplemented()
 
+unitTypes = {}
+
+def unitType(name):
+    # Utilisé pour retrouver le type unitaire après un "pickle" :
+    # les types unitaires sont comparés par identité.
+    return unitTypes[name]
+
 def _buildUnitType(name):
     class _UnitType(Type):
+        __slots__ = ()
+
         def __init__(self):
             pass
 
@@ -53,7 +96,11 @@ def _buildUnitType(name):
         def type_repr(self):
             return name
 
-    return _UnitType()
+        def __reduce__(self):
+            return (unitType, (name,))
+
+    unitTypes[name] = _UnitType()
+    return unitTypes[name]
 
 Void = _buildUnitType("void")
 Integer = _buildUnitType("Integer")
@@ -64,6 +111,10 @@ def isUnitType(type):
     return type == Integer or type == Boolean or type == String
 
 class BoxType(Type):
+    # "contentType" sert aussi aux "Box" : "instantiateGenerics"
+    # l'affecte au lieu de "wrapped".
+    __slots__ = ("_pos", "wrapped", "contentType")
+
     def __init__(self, pos, wrapped):
         self._pos = pos
         self.wrapped = wrapped
@@ -78,6 +129,8 @@ class BoxType(Type):
         return self.type_repr()
 
 class GenericBoxType(Type):
+    __slots__ = ("_pos", "genericName")
+
     def __init__(self, pos, genericName):
         self._pos = pos
         self.genericName = genericName
@@ -92,6 +145,8 @@ class GenericBoxType(Type):
         return self.type_repr()
 
 class ListType(BoxType):
+    __slots__ = ()
+
     def __init__(self, pos, contentType):
         super().__init__(pos, TupleType(pos, [contentType, self]))
         self.contentType = contentType
@@ -100,6 +155,8 @@ class ListType(BoxType):
         return "List({})".format(self.contentType.type_repr())
 
 class TupleType(Type):
+    __slots__ = ("_pos", "contents")
+
     def __init__(self, pos, contents):
         self._pos = pos
         self.contents = contents
@@ -124,6 +181,8 @@ class TupleType(Type):
         return "({})".format(contents)
 
 class FunctionType(Type):
+    __slots__ = ("_pos", "args", "ret")
+
     def __init__(self, pos, args, ret):
         self._pos = pos
         self.args = args
@@ -141,5 +200,60 @@ class FunctionType(Type):
         return "{}{}".format(args, self.ret.type_repr())
 
 class NativeFunction(FunctionType):
+    __slots__ = ()
+
     def type_repr(self):
         return "(native) {}".format(super().type_repr())
+
+class TypeIds:
+    # Les types gardent leur position (pour les messages d'erreur), donc
+    # deux types de même structure sont souvent des objets différents.
+    # On associe à chaque structure un identifiant unique : deux types
+    # ont le même identifiant si et seulement si ils ont la même
+    # structure, aux positions près. Une table ne sert qu'à la
+    # compilation d'une fonction (voir "Varstack") : elle garde les
+    # types qu'elle a vus.
+    def __init__(self):
+        self.ids = {}
+        self.structures = {}
+        # Les identifiants des types qui contiennent un
+        # "GenericBoxType".
+        self.generic = set()
+
+    def typeId(self, type):
+        # Renvoie None si "type" n'est pas un type.
+        id = self.ids.get(type)
+
+        if id != None:
+            return id
+
+        if type == None:
+            # Accepte n'importe quel type (voir "assertTypeMatch").
+            structure = ("any",)
+        elif isinstance(type, ListType):
+            structure = ("list", self.typeId(type.contentType))
+        elif isinstance(type, BoxType):
+            structure = ("box", self.typeId(type.wrapped))
+        elif isinstance(type, GenericBoxType):
+            structure = ("generic", type.genericName)
+        elif isinstance(type, TupleType):
+            structure = ("tuple",) + tuple(
+                self.typeId(c) for c in type.contents
+            )
+        elif type in unitTypes.values():
+            structure = ("unit", type.type_repr())
+        else:
+            return None
+
+        if None in structure:
+            return None
+
+        id = self.structures.setdefault(structure, len(self.structures))
+        self.ids[type] = id
+
+        if structure[0] == "generic" or any(
+            c in self.generic for c in structure[1:]
+        ):
+            self.generic.add(id)
+
+        return id
@@ -0,0 +1,320 @@
+from program_types import *
+from flatIR import *
+from allocateSlots import FlowGraph, operandVars
+from foldConstants import foldOperand, isConstant, mayFail
+
+# Propagation des copies et suppression des affectations inutiles.
+#
+# Le "flattener" produit beaucoup de copies ("v12 <- v7", puis
+# "v13 <- v12", pour les valeurs des blocs et des "if") et de
+# temporaires qui ne sont plus lus ensuite. On remplace d'abord chaque
+# lecture d'une copie par la variable (ou la constante) copiée, tant
+# qu'aucune des deux n'a été réaffectée, en évaluant au passage les
+# opérations devenues constantes (voir "foldConstants"), puis on
+# supprime les affectations dont la variable n'est jamais lue.
+
+def isCopy(comm):
+    if not isinstance(comm, Assign):
+        return False
+
+    if isinstance(comm.r, TypedVar):
+        return comm.r.virtualType == VirtualVarType.REAL
+    elif isinstance(comm.r, TypedConstant):
+        return comm.r.type in (Integer, Boolean, String)
+    else:
+        return False
+
+def sameOperand(a, b):
+    if isinstance(a, TypedConstant) and isinstance(b, TypedConstant):
+        return a.type == b.type and a.val == b.val
+
+    return a is b
+
+def substitute(operand, copies):
+    # Renvoie "operand" où chaque variable copiée est remplacée par sa
+    # source. Les opérandes peuvent être partagés : on ne les modifie
+    # pas, on en construit de nouveaux.
+    if isinstance(operand, TypedVar):
+        return copies.get(operand, operand)
+    elif isinstance(operand, TypedArith):
+        return TypedArith(
+            operand.pos(), operand.type, operand.op,
+            [substitute(o, copies) for o in operand.operands]
+        )
+    elif isinstance(operand, TypedUnary):
+        return TypedUnary(
+            operand.pos(), None, operand.op,
+            substitute(operand.target, copies)
+        )
+    elif isinstance(operand, TypedCmp):
+        return TypedCmp(
+            operand.pos(),
+            substitute(operand.lop, copies),
+            operand.op,
+            substitute(operand.rop, copies)
+        )
+    elif isinstance(operand, TypedTuple):
+        return TypedTuple(
+            operand.pos(), operand.type,
+            [substitute(o, copies) for o in operand.contents]
+        )
+    else:
+        return operand
+
+def assignedVars(commands, out):
+    # Ajoute à "out" les variables affectées par "commands".
+    for comm in commands:
+        if isinstance(comm, Assign):
+            out.add(comm.l)
+        elif isinstance(comm, FlatCallBase):
+            out.update(comm.output)
+        elif isinstance(comm, TypedIf):
+            assignedVars(comm.aIfTrue, out)
+            assignedVars(comm.aElse, out)
+        elif isinstance(comm, TypedLoop):
+            assignedVars(comm.commands, out)
+
+    return out
+
+def kill(copies, vars):
+    # Oublie les copies vers ou depuis les variables de "vars".
+    for var, source in list(copies.items()):
+        if var in vars or source in vars:
+            del copies[var]
+
+def join(a, b):
+    # "None" représente un point du code qu'on n'atteint jamais
+    # (après un "break").
+    if a == None:
+        return b
+    if b == None:
+        return a
+
+    return {
+        var: source for var, source in a.items()
+        if var in b and sameOperand(b[var], source)
+    }
+
+def propagateInCommands(commands, copies, stats):
+    # Renvoie le couple (commands, copies) des commandes réécrites et
+    # des copies valables à leur fin (ou None si on n'y arrive jamais).
+    kept = []
+
+    def rewrite(operand):
+        operand, folded = foldOperand(substitute(operand, copies))
+        stats["folded"] += folded
+        return operand
+
+    for comm in commands:
+        if copies == None:
+            # Ces commandes ne sont jamais exécutées.
+            break
+
+        if isinstance(comm, Assign):
+            comm.r = rewrite(comm.r)
+            kill(copies, (comm.l,))
+
+            if isCopy(comm) and comm.r is not comm.l:
+                copies[comm.l] = comm.r
+        elif isinstance(comm, FlatCallBase):
+            comm.input = [rewrite(o) for o in comm.input]
+            kill(copies, set(comm.output))
+        elif isinstance(comm, TypedIf):
+            comm.cond = rewrite(comm.cond)
+
+            if isConstant(comm.cond, Boolean):
+                # Seule l'une des branches peut être exécutée.
+                stats["pruned"] += 1
+                branch = comm.aIfTrue if comm.cond.val else comm.aElse
+                branch, copies = propagateInCommands(branch, copies, stats)
+                kept.extend(branch)
+                continue
+
+            comm.aIfTrue, copiesIfTrue = propagateInCommands(
+                comm.aIfTrue, dict(copies), stats
+            )
+            comm.aElse, copiesElse = propagateInCommands(
+                comm.aElse, dict(copies), stats
+            )
+            copies = join(copiesIfTrue, copiesElse)
+        elif isinstance(comm, TypedLoop):
+            # Le corps de la boucle est aussi atteint depuis sa fin :
+            # seules restent valables les copies qu'il ne touche pas,
+            # et ce sont aussi les seules sûres à la sortie.
+            kill(copies, assignedVars(comm.commands, set()))
+            comm.commands, _ = propagateInCommands(
+                comm.commands, dict(copies), stats
+            )
+        elif isinstance(comm, TypedBreak):
+            copies = None
+
+        kept.append(comm)
+
+    return kept, copies
+
+def propagateCopies(function):
+    # Renvoie le couple (folded, pruned) des nombres d'opérations
+    # évaluées et de "if" dont la condition était constante.
+    stats = {"folded": 0, "pruned": 0}
+    function.commands, copies = propagateInCommands(
+        function.commands, {}, stats
+    )
+
+    if copies != None:
+        function.value = [substitute(o, copies) for o in function.value]
+
+    return stats["folded"], stats["pruned"]
+
+def countCommands(commands):
+    count = 0
+
+    for comm in commands:
+        count += 1
+
+        if isinstance(comm, TypedIf):
+            count += countCommands(comm.aIfTrue)
+            count += countCommands(comm.aElse)
+        elif isinstance(comm, TypedLoop):
+            count += countCommands(comm.commands)
+
+    return count
+
+def withoutCommands(commands, removed):
+    # Renvoie "commands" sans les commandes de "removed" (des "id"), ni
+    # les "if" devenus vides.
+    kept = []
+
+    for comm in commands:
+        if id(comm) in removed:
+            continue
+
+        if isinstance(comm, TypedIf):
+            comm.aIfTrue = withoutCommands(comm.aIfTrue, removed)
+            comm.aElse = withoutCommands(comm.aElse, removed)
+
+            if (
+                len(comm.aIfTrue) == 0 and len(comm.aElse) == 0 and
+                not mayFail(comm.cond)
+            ):
+                continue
+        elif isinstance(comm, TypedLoop):
+            comm.commands = withoutCommands(comm.commands, removed)
+
+        kept.append(comm)
+
+    return kept
+
+def removeDeadAssigns(function):
+    # Renvoie le couple (copies, others) des nombres de copies et
+    # d'autres affectations supprimées.
+    graph = FlowGraph()
+    graph.add([], function.args)
+    graph.addCommands(function.commands)
+    graph.add(operandVars(function.value), [])
+
+    # Une affectation sans effet de bord ne rend ses opérandes vivants
+    # que si sa variable l'est : une chaîne de temporaires inutiles
+    # disparaît donc en une seule passe.
+    removable = set()
+
+    for node, comm in enumerate(graph.commands):
+        if (
+            isinstance(comm, Assign) and comm.l.id >= 0 and
+            comm.l.virtualType == VirtualVarType.REAL and
+            not mayFail(comm.r)
+        ):
+            removable.add(node)
+
+    liveOut = graph.liveOut(removable)
+    removed = set()
+    copies = 0
+    others = 0
+
+    for node in removable:
+        comm = graph.commands[node]
+
+        if liveOut[node] & graph.defs[node] == 0 or comm.r is comm.l:
+            removed.add(id(comm))
+
+            if isCopy(comm):
+                copies += 1
+            else:
+                others += 1
+
+    function.commands = withoutCommands(function.commands, removed)
+    return copies, others
+
+def canForward(previous, cond, live):
+    # Vrai si l'affectation "previous", juste avant un "if" de
+    # condition "cond", peut être faite dans la condition : sa variable
+    # ("live" est l'ensemble des variables vivantes après la condition)
+    # n'est lue qu'une fois, par "cond". Sauf quand elle est toute la
+    # condition, sa valeur ne doit pas pouvoir échouer : après un "and"
+    # ou un "or", elle n'est pas toujours évaluée.
+    if not (
+        isinstance(previous, Assign) and previous.l.id >= 0 and
+        previous.l.virtualType == VirtualVarType.REAL and
+        live & (1 << previous.l.id) == 0
+    ):
+        return False
+
+    if previous.l is cond:
+        return True
+
+    return (
+        isinstance(
+            previous.r, (TypedVar, TypedConstant, Arith, Unary, TypedCmp)
+        ) and
+        not mayFail(previous.r) and
+        sum(var is previous.l for var in operandVars([cond])) == 1
+    )
+
+def forwardInCommands(commands, nodes, liveOut):
+    # Renvoie le couple (commands, forwarded), voir "forwardConditions".
+    forwarded = 0
+    kept = []
+
+    for comm in commands:
+        if isinstance(comm, TypedIf):
+            comm.aIfTrue, n = forwardInCommands(comm.aIfTrue, nodes, liveOut)
+            forwarded += n
+            comm.aElse, n = forwardInCommands(comm.aElse, nodes, liveOut)
+            forwarded += n
+            live = liveOut[nodes[id(comm)]]
+
+            while len(kept) != 0 and canForward(kept[-1], comm.cond, live):
+                previous = kept.pop()
+                comm.cond = substitute(comm.cond, {previous.l: previous.r})
+                forwarded += 1
+        elif isinstance(comm, TypedLoop):
+            comm.commands, n = forwardInCommands(
+                comm.commands, nodes, liveOut
+            )
+            forwarded += n
+
+        kept.append(comm)
+
+    return kept, forwarded
+
+def forwardConditions(function):
+    # Remplace "t <- cond; if t ..." par "if cond ...", quand "t"
+    # n'est plus lue ensuite, ainsi que les temporaires qui précèdent
+    # le "if" et ne sont lus qu'une fois par sa condition (les
+    # conditions composées d'une chaîne de "else if" restent ainsi dans
+    # le test de chaque branche, voir "ifChain"). Renvoie le nombre
+    # d'affectations remplacées.
+    graph = FlowGraph()
+    graph.add([], function.args)
+    graph.addCommands(function.commands)
+    graph.add(operandVars(function.value), [])
+    liveOut = graph.liveOut()
+    nodes = {}
+
+    for node, comm in enumerate(graph.commands):
+        if isinstance(comm, TypedIf):
+            nodes[id(comm)] = node
+
+    function.commands, forwarded = forwardInCommands(
+        function.commands, nodes, liveOut
+    )
+    return forwarded
@@ -0,0 +1,339 @@
+from program_types import *
+from flatIR import *
+from propagateCopies import assignedVars
+
+# Élimination des sous-expressions communes.
+#
+# Une expression sans effet de bord ("TypedArith", "TypedCmp",
+# "TypedUnary", ou les fonctions natives "full" et "unwrap") qui a déjà
+# été évaluée, et dont aucune variable n'a été réaffectée depuis, n'est
+# pas recalculée : on relit la variable qui contient sa valeur. Si la
+# première évaluation n'était pas affectée telle quelle à une
+# variable, on crée un temporaire juste avant la commande qui la
+# contenait.
+#
+# Une expression évaluée avant un "if" ou une boucle reste disponible
+# dedans (si la boucle ne touche pas ses variables) ; celles évaluées
+# dans une branche ou dans une boucle ne le sont plus après.
+#
+# On parcourt d'abord les commandes pour trouver les expressions
+# répétées ("Occurrences"), puis on les réécrit ("rewriteCommands").
+
+sharedNatives = ("full", "unwrap")
+
+class Instance:
+    # Une valeur disponible : la première expression qui l'a calculée,
+    # la commande qui la contenait, les variables qui la contiennent
+    # ("holders", None s'il faut un temporaire) et le nombre de fois où
+    # elle a été réutilisée.
+    def __init__(self, kind, node, command):
+        self.kind = kind
+        self.node = node
+        self.command = command
+        self.holders = None
+        self.hits = 0
+        self.temp = None
+
+class Occurrences:
+    def __init__(self):
+        # Clé d'expression -> "Instance" disponible.
+        self.table = {}
+        # Pour chaque variable, les clés qui la lisent ou qui sont
+        # contenues dans cette variable.
+        self.users = {}
+        # "id" d'un nœud (ou d'une commande) déjà calculé -> "Instance".
+        self.hits = {}
+        # "id" de la première évaluation d'une valeur gardée dans un
+        # temporaire -> "Instance" (voir "shareSubexpressions").
+        self.firsts = {}
+        self.instances = []
+        # Les clés des expressions composées sont des entiers : la clé
+        # d'un nœud est construite à partir de celles de ses opérandes
+        # sans parcourir tout le sous-arbre. "self.keyVars" donne les
+        # variables lues par chacune.
+        self.keys = {}
+        self.keyIds = {}
+        self.keyVars = []
+
+    def key(self, node):
+        # Renvoie la clé structurelle de "node", et la note dans
+        # "self.keys" pour les nœuds composés.
+        if isinstance(node, TypedVar):
+            return node
+        elif isinstance(node, TypedConstant):
+            return ("constant", node.type, node.val)
+
+        known = self.keys.get(id(node))
+
+        if known != None:
+            return known
+
+        if isinstance(node, TypedArith):
+            operands = [self.key(o) for o in node.operands]
+            structure = ("arith", node.op, tuple(operands))
+        elif isinstance(node, TypedCmp):
+            operands = [self.key(node.lop), self.key(node.rop)]
+            structure = ("cmp", node.op, operands[0], operands[1])
+        elif isinstance(node, TypedUnary):
+            operands = [self.key(node.target)]
+            structure = ("unary", node.op, operands[0])
+        else:
+            operands = []
+            structure = ("other", id(node))
+
+        key = self.keyIds.get(structure)
+
+        if key == None:
+            key = len(self.keyVars)
+            self.keyIds[structure] = key
+            vars = set()
+
+            for o in operands:
+                if isinstance(o, TypedVar):
+                    vars.add(o)
+                elif isinstance(o, int):
+                    vars.update(self.keyVars[o])
+
+            self.keyVars.append(vars)
+
+        self.keys[id(node)] = key
+        return key
+
+    def register(self, key, vars, instance):
+        self.table[key] = instance
+        self.instances.append(instance)
+
+        for var in vars:
+            self.users.setdefault(var, set()).add(key)
+
+    def kill(self, table, vars):
+        # Retire de "table" les valeurs qui lisent l'une des variables
+        # de "vars", ou qui n'étaient contenues que dans l'une d'elles.
+        for var in vars:
+            for key in self.users.get(var, ()):
+                table.pop(key, None)
+
+    def visit(self, node, command, conditional):
+        # Parcourt l'opérande "node" de "command". Une expression
+        # évaluée sous condition (après le premier opérande d'un "and"
+        # ou d'un "or") peut réutiliser une valeur, mais n'en fournit
+        # pas.
+        if not isinstance(node, (TypedArith, TypedCmp, TypedUnary)):
+            return
+
+        if isinstance(node, TypedArith) and len(node.operands) < 2:
+            for o in node.operands:
+                self.visit(o, command, conditional)
+            return
+
+        key = self.key(node)
+        instance = self.table.get(key)
+
+        if instance != None:
+            instance.hits += 1
+            self.hits[id(node)] = instance
+            return
+
+        if isinstance(node, TypedArith):
+            shortCircuit = (
+                node.op == Operation.AND or node.op == Operation.OR
+            )
+
+            for i, o in enumerate(node.operands):
+                self.visit(
+                    o, command, conditional or (shortCircuit and i != 0)
+                )
+
+            kind = node.op.pretty(0)
+        elif isinstance(node, TypedCmp):
+            self.visit(node.lop, command, conditional)
+            self.visit(node.rop, command, conditional)
+            kind = node.op.pretty(0)
+        else:
+            self.visit(node.target, command, conditional)
+            kind = node.op.pretty(0)
+
+        if not conditional:
+            instance = Instance(kind, node, command)
+            self.register(key, self.keyVars[key], instance)
+
+    def visitCommands(self, commands):
+        for comm in commands:
+            if isinstance(comm, Assign):
+                self.visit(comm.r, comm, False)
+                self.kill(self.table, (comm.l,))
+
+                instance = self.table.get(self.keys.get(id(comm.r)))
+
+                if (
+                    instance != None and instance.node is comm.r and
+                    comm.l.virtualType == VirtualVarType.REAL
+                ):
+                    # La valeur est gardée dans "comm.l" jusqu'à ce
+                    # qu'elle soit réaffectée.
+                    instance.holders = [comm.l]
+                    self.users.setdefault(comm.l, set()).add(
+                        self.keys[id(comm.r)]
+                    )
+            elif isinstance(comm, FlatCallBase):
+                for o in comm.input:
+                    self.visit(o, comm, False)
+
+                self.visitNative(comm)
+            elif isinstance(comm, TypedIf):
+                self.visit(comm.cond, comm, False)
+                table = self.table
+                self.table = dict(table)
+                self.visitCommands(comm.aIfTrue)
+                self.table = dict(table)
+                self.visitCommands(comm.aElse)
+                self.table = table
+                self.kill(
+                    table, assignedVars(comm.aIfTrue + comm.aElse, set())
+                )
+            elif isinstance(comm, TypedLoop):
+                self.kill(self.table, assignedVars(comm.commands, set()))
+                table = self.table
+                self.table = dict(table)
+                self.visitCommands(comm.commands)
+                self.table = table
+
+    def visitNative(self, comm):
+        output = comm.output
+        isShared = (
+            isinstance(comm, NativeCall) and
+            comm.target in sharedNatives and
+            all(isinstance(o, TypedVar) for o in comm.input) and
+            all(o.virtualType == VirtualVarType.REAL for o in output)
+        )
+        key = None
+
+        if isShared:
+            key = (comm.target, tuple(comm.input))
+            instance = self.table.get(key)
+
+            if instance != None:
+                instance.hits += 1
+                self.hits[id(comm)] = instance
+                # Les variables de sortie sont affectées par les copies
+                # qui remplacent l'appel.
+                self.kill(self.table, output)
+                return
+
+        self.kill(self.table, output)
+
+        if isShared and not any(o in comm.input for o in output):
+            instance = Instance(comm.target, comm, comm)
+            instance.holders = list(output)
+            self.register(key, list(comm.input) + list(output), instance)
+
+def tempType(node):
+    if isinstance(node, TypedArith):
+        return node.type
+
+    return Boolean
+
+def rewrite(node, occurrences, root=True):
+    # Renvoie "node" où chaque expression déjà calculée est remplacée
+    # par la variable qui la contient.
+    if root:
+        instance = occurrences.hits.get(id(node))
+
+        if instance == None:
+            instance = occurrences.firsts.get(id(node))
+
+        if instance != None:
+            if instance.holders != None:
+                return instance.holders[0]
+            return instance.temp
+
+    if isinstance(node, TypedArith):
+        return TypedArith(
+            node.pos(), node.type, node.op,
+            [rewrite(o, occurrences) for o in node.operands]
+        )
+    elif isinstance(node, TypedUnary):
+        return TypedUnary(
+            node.pos(), None, node.op, rewrite(node.target, occurrences)
+        )
+    elif isinstance(node, TypedCmp):
+        return TypedCmp(
+            node.pos(),
+            rewrite(node.lop, occurrences),
+            node.op,
+            rewrite(node.rop, occurrences)
+        )
+    else:
+        return node
+
+def rewriteCommands(commands, occurrences, inserts):
+    kept = []
+
+    for comm in commands:
+        kept.extend(inserts.get(id(comm), ()))
+
+        if isinstance(comm, Assign):
+            comm.r = rewrite(comm.r, occurrences)
+        elif isinstance(comm, FlatCallBase):
+            instance = occurrences.hits.get(id(comm))
+
+            if instance != None:
+                # Les sorties d'un appel déjà fait sont des copies.
+                for out, holder in zip(comm.output, instance.holders):
+                    kept.append(Assign(comm.pos(), out, holder))
+                continue
+
+            comm.input = [rewrite(o, occurrences) for o in comm.input]
+        elif isinstance(comm, TypedIf):
+            comm.cond = rewrite(comm.cond, occurrences)
+            comm.aIfTrue = rewriteCommands(
+                comm.aIfTrue, occurrences, inserts
+            )
+            comm.aElse = rewriteCommands(comm.aElse, occurrences, inserts)
+        elif isinstance(comm, TypedLoop):
+            comm.commands = rewriteCommands(
+                comm.commands, occurrences, inserts
+            )
+
+        kept.append(comm)
+
+    return kept
+
+def shareSubexpressions(function):
+    # Renvoie le dictionnaire (kind -> nombre) des évaluations
+    # remplacées par la lecture d'une variable, par type d'opération.
+    occurrences = Occurrences()
+    occurrences.visitCommands(function.commands)
+
+    nextId = 1 + max([var.id for var in function.vars], default=-1)
+    inserts = {}
+    shared = {}
+
+    for instance in occurrences.instances:
+        if instance.hits == 0:
+            continue
+
+        shared[instance.kind] = shared.get(instance.kind, 0) + instance.hits
+
+        if instance.holders != None:
+            continue
+
+        # La première évaluation est au milieu d'une commande : on la
+        # sort dans un temporaire, juste avant.
+        node = instance.node
+        temp = TypedVar(node.pos(), tempType(node), None)
+        temp.setId(nextId)
+        nextId += 1
+        function.vars.append(temp)
+        instance.temp = temp
+        occurrences.firsts[id(node)] = instance
+        inserts.setdefault(id(instance.command), []).append(
+            Assign(node.pos(), temp, rewrite(node, occurrences, False))
+        )
+
+    if len(shared) != 0:
+        function.commands = rewriteCommands(
+            function.commands, occurrences, inserts
+        )
+
+    return shared
@@ -2,6 +2,10 @@
 from program_types import *
 from flatIR import *
 
+# Nombre minimal de branches d'une chaîne de "if" pour les remplacer par
+# une recherche dans un dictionnaire (voir "transpileIf").
+minTableSize = 4
+
 def transpileVar(var):
     id = var.id
 
@@ -66,6 +70,10 @@ def transpileCmp(cmp):
 
 def transpileConstant(constant):
     if constant.type == Integer:
+        # Une constante négative peut venir de "foldConstants".
+        if constant.val < 0:
+            return "({})".format(constant.val)
+
         return "{}".format(constant.val)
     elif constant.type == Boolean:
         return "{}".format(constant.val)
@@ -102,7 +110,195 @@ def transpileVarList(list):
 
     return out
 
-def transpileCommands(indent, isInLoop, commands):
+def ifChain(comm):
+    # Renvoie le couple (branches, aElse) d'une chaîne
+    # "if ... else if ... else ...", où "branches" est la liste des
+    # couples (cond, commands).
+    branches = [(comm.cond, comm.aIfTrue)]
+    aElse = comm.aElse
+
+    while (
+        len(aElse) == 1 and isinstance(aElse[0], TypedIf) and
+        len(aElse[0].aIfTrue) != 0
+    ):
+        branches.append((aElse[0].cond, aElse[0].aIfTrue))
+        aElse = aElse[0].aElse
+
+    return branches, aElse
+
+def tableKey(cond):
+    # Renvoie le couple (var, constant) si "cond" compare une variable
+    # à une constante entière, None sinon.
+    if not (isinstance(cond, TypedCmp) and cond.op == Comparison.EQ):
+        return None
+
+    (var, key) = (cond.lop, cond.rop)
+
+    if isinstance(var, TypedConstant):
+        (var, key) = (key, var)
+
+    if not (isinstance(var, TypedVar) and isinstance(key, TypedConstant)):
+        return None
+
+    if key.type != Integer:
+        return None
+
+    return var, key
+
+def tableEntry(commands):
+    # Renvoie le couple (targets, values) si "commands" ne fait
+    # qu'affecter des constantes aux variables "targets", None sinon.
+    targets = []
+    values = []
+
+    for comm in commands:
+        if not (
+            isinstance(comm, Assign) and isinstance(comm.r, TypedConstant)
+        ):
+            return None
+
+        targets.append(comm.l)
+        values.append(comm.r)
+
+    if len(targets) == 0:
+        return None
+
+    return targets, values
+
+def tablePrefix(branches):
+    # Renvoie le triplet (count, var, targets) où "count" est le nombre
+    # de premières branches de la chaîne qui comparent la même variable
+    # "var" à une constante, et n'affectent que des constantes aux mêmes
+    # variables "targets".
+    count = 0
+    var = None
+    targets = None
+
+    for cond, commands in branches:
+        key = tableKey(cond)
+        entry = tableEntry(commands)
+
+        if key == None or entry == None:
+            break
+
+        ids = [target.id for target in entry[0]]
+
+        if count == 0:
+            (var, targets) = (key[0], entry[0])
+        elif key[0].id != var.id or ids != [t.id for t in targets]:
+            break
+
+        count += 1
+
+    return count, var, targets
+
+def tableLiteral(values):
+    if len(values) == 1:
+        return transpileOperand(values[0])
+
+    return "({})".format(transpileVarList(values))
+
+def transpileIf(indent, loop, comm, tables, escaping):
+    tabs = "\t"*indent
+    cond = transpileOperand(comm.cond)
+
+    if len(comm.aIfTrue) == 0:
+        if len(comm.aElse) == 0:
+            return ""
+
+        return "{}if not {}:\n{}".format(
+            tabs,
+            cond,
+            transpileCommands(
+                indent + 1, loop, comm.aElse, tables, escaping
+            )
+        )
+
+    # Les "else if" sont écrits "elif", sans imbriquer les blocs.
+    branches, aElse = ifChain(comm)
+    out = ""
+
+    # Quand les premières branches comparent une même variable à des
+    # constantes, et n'affectent que des constantes aux mêmes
+    # variables, on les remplace par une recherche dans un dictionnaire
+    # construit une fois pour toutes (un argument par défaut de la
+    # fonction).
+    count, var, targets = tablePrefix(branches)
+
+    if count >= minTableSize:
+        table = {}
+
+        # Comme dans la chaîne, la première branche qui convient
+        # l'emporte.
+        for cond, commands in branches[:count]:
+            key = tableKey(cond)[1].val
+
+            if not key in table:
+                table[key] = tableLiteral(tableEntry(commands)[1])
+
+        name = "t{}".format(len(tables))
+        tables.append("{}={{{}}}".format(
+            name,
+            ",".join("{}:{}".format(k, v) for k, v in table.items())
+        ))
+
+        l = transpileVarList(targets)
+        v = transpileVar(var)
+        branches = branches[count:]
+        default = tableEntry(aElse)
+
+        if (
+            len(branches) == 0 and default != None and
+            [t.id for t in default[0]] == [t.id for t in targets]
+        ):
+            return "{}{}={}.get({},{})\n".format(
+                tabs, l, name, v, tableLiteral(default[1])
+            )
+
+        out += "{}if {} in {}:\n{}\t{}={}[{}]\n".format(
+            tabs, v, name, tabs, l, name, v
+        )
+
+    for cond, commands in branches:
+        out += "{}{} {}:\n{}".format(
+            tabs,
+            "if" if out == "" else "elif",
+            transpileOperand(cond),
+            transpileCommands(indent + 1, loop, commands, tables, escaping)
+        )
+
+    if len(aElse) != 0:
+        out += "{}else:\n{}".format(
+            tabs,
+            transpileCommands(indent + 1, loop, aElse, tables, escaping)
+        )
+
+    return out
+
+def escapingLoops(commands, loops, escaping):
+    # Ajoute à "escaping" les boucles dont on peut sortir par un "break"
+    # qui vise une boucle qui les contient ("loops" est la liste des
+    # boucles qui contiennent "commands", de l'extérieur vers
+    # l'intérieur), et renvoie "escaping".
+    for comm in commands:
+        if isinstance(comm, TypedBreak):
+            if comm.loopid in loops:
+                escaping.update(loops[loops.index(comm.loopid) + 1:])
+        elif isinstance(comm, TypedIf):
+            escapingLoops(comm.aIfTrue, loops, escaping)
+            escapingLoops(comm.aElse, loops, escaping)
+        elif isinstance(comm, TypedLoop):
+            escapingLoops(comm.commands, loops + [comm.loopid], escaping)
+
+    return escaping
+
+def transpileCommands(indent, loop, commands, tables, escaping):
+    # "loop" est la boucle qui contient directement "commands" (None
+    # hors des boucles). Un "break" qui sort de plusieurs boucles donne
+    # sa cible à "loopid" ; après chacune des boucles qu'il traverse
+    # (celles de "escaping", voir "escapingLoops"), on sort de la
+    # suivante si "loopid" n'est pas la boucle qu'on vient de quitter.
+    # Les autres "break" sont de simples "break" Python.
     out = ""
     tabs = "\t"*indent
 
@@ -141,38 +337,16 @@ def transpileCommands(indent, isInLoop, commands):
 
             out += "{}{}\n".format(tabs, cmd)
         elif isinstance(comm, TypedIf):
-            cond = transpileOperand(comm.cond)
-            hasIfClause = (len(comm.aIfTrue) != 0)
-            cIfTrue = transpileCommands(
-                indent + 1, isInLoop, comm.aIfTrue
-            )
-            hasElseClause = (len(comm.aElse) != 0)
-            cElse = transpileCommands(
-                indent + 1, isInLoop, comm.aElse
-            )
-
-            if hasIfClause:
-                if hasElseClause:
-                    out += "{}if {}:\n{}{}else:\n{}".format(
-                        tabs,
-                        cond,
-                        cIfTrue,
-                        tabs,
-                        cElse
-                    )
-                else:
-                    out += "{}if {}:\n{}".format(
-                        tabs,
-                        cond,
-                        cIfTrue
-                    )
+            out += transpileIf(indent, loop, comm, tables, escaping)
         elif isinstance(comm, TypedLoop):
-            body = transpileCommands(indent + 1, True, comm.commands)
+            body = transpileCommands(
+                indent + 1, comm.loopid, comm.commands, tables, escaping
+            )
             if body == "":
                 body = "{}\tpass\n".format(tabs)
 
             tailFrag = ""
-            if isInLoop:
+            if comm.loopid in escaping:
                 tailFrag = "{}if loopid!={}:\n{}\tbreak\n".format(
                     tabs,
                     comm.loopid,
@@ -184,11 +358,10 @@ def transpileCommands(indent, isInLoop, commands):
                 tailFrag
             )
         elif isinstance(comm, TypedBreak):
-            out += "{}loopid={}\n{}break\n".format(
-                tabs,
-                comm.loopid,
-                tabs
-            )
+            if comm.loopid != loop or loop in escaping:
+                out += "{}loopid={}\n".format(tabs, comm.loopid)
+
+            out += "{}break\n".format(tabs)
         else:
             out += "{}{}\n".format(tabs, transpileOperand(comm))
 
@@ -196,17 +369,24 @@ def transpileCommands(indent, isInLoop, commands):
 
 def transpileFunction(function):
     name = function.name
-    args = transpileVarList(function.args)
-    body = transpileCommands(2, False, function.commands)
+    # Les tables de "transpileIf" sont des arguments par défaut :
+    # elles ne sont construites qu'une fois, et lues comme des
+    # variables locales.
+    tables = []
+    escaping = escapingLoops(function.commands, [], set())
+    body = transpileCommands(2, None, function.commands, tables, escaping)
+    args = ",".join(
+        [transpileOperand(arg) for arg in function.args] + tables
+    )
     value = transpileVarList(function.value)
 
-    loopfrag = "\t\tloopid=0"
+    loopfrag = ""
 
-    if body != "":
-        return "\tdef f_{}({}):\n{}\n{}\t\treturn {}\n".format(
-            name, args, loopfrag, body, value
-        )
-    else:
-        return "\tdef f_{}({}):\n{}\n\t\treturn {}\n".format(
-            name, args, loopfrag, value
-        )
+    # "loopid" n'est lue qu'après une boucle de "escaping", dont on ne
+    # sort qu'en l'affectant.
+    if len(escaping) != 0:
+        loopfrag = "\t\tloopid=0\n"
+
+    return "\tdef f_{}({}):\n{}{}\t\treturn {}\n".format(
+        name, args, loopfrag, body, value
+    )